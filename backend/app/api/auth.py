@@ -1,21 +1,46 @@
 """
 Authentication endpoints for Google OAuth and JWT token management.
 """
-from fastapi import APIRouter, HTTPException, Response, Request, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Response, Request, Depends
 from pydantic import BaseModel
 from typing import Optional
+from cachetools import TTLCache
+import asyncio
+import hashlib
+import httpx
+import orjson
+import re
 from ..core.config import get_settings
+from ..core.http_clients import get_google_client
 from ..core.security import (
     verify_google_token,
+    JWT_SIGNS_INLINE,
     create_access_token,
     create_refresh_token,
     verify_jwt_token,
     blacklist_token,
+    publish_user_tokens,
     jwt_bearer
 )
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# Google profiles fetched with an access token, keyed by the token's SHA-256
+# digest. Only successful lookups are stored.
+_userinfo_cache: TTLCache = TTLCache(maxsize=2048, ttl=300)
+
+# Refresh cookie attributes, rendered once into the Set-Cookie suffix since
+# settings are fixed for the process lifetime. Same attributes (and order) as
+# Response.set_cookie would emit; JWTs are URL-safe so no quoting is needed.
+_settings = get_settings()
+_REFRESH_COOKIE_ATTRS = (
+    "; HttpOnly"
+    f"; Max-Age={60 * 60 * 24 * 7}"  # 7 days
+    "; Path=/api/auth"
+    f"; SameSite={_settings.cookie_samesite}"
+    + ("; Secure" if _settings.cookie_secure else "")
+)
+
 
 def _set_refresh_token_cookie(response: Response, refresh_token: str) -> None:
     """
@@ -25,18 +50,29 @@ def _set_refresh_token_cookie(response: Response, refresh_token: str) -> None:
     - Production: secure=True (HTTPS only), samesite=strict
     - Development: secure=False (allows HTTP), samesite=lax
     """
-    settings = get_settings()
-    response.set_cookie(
-        key="refresh_token",
-        value=refresh_token,
-        httponly=True,
-        secure=settings.cookie_secure,
-        samesite=settings.cookie_samesite,
-        max_age=60 * 60 * 24 * 7,  # 7 days
-        path="/api/auth"
+    response.raw_headers.append(
+        (b"set-cookie", f"refresh_token={refresh_token}{_REFRESH_COOKIE_ATTRS}".encode("latin-1"))
     )
 
 
+_REFRESH_COOKIE_RE = re.compile(rb"(?:^|;)\s*refresh_token=([^;]*)")
+
+
+def _get_refresh_token_cookie(request: Request) -> Optional[str]:
+    """
+    Read the refresh_token cookie straight from the raw Cookie header(s).
+
+    Equivalent to request.cookies.get("refresh_token") without parsing
+    every other cookie the browser sends.
+    """
+    for name, value in request.scope["headers"]:
+        if name == b"cookie":
+            match = _REFRESH_COOKIE_RE.search(value)
+            if match:
+                return match.group(1).strip().decode("latin-1") or None
+    return None
+
+
 class GoogleToken(BaseModel):
     """Google OAuth credential from frontend."""
     credential: str
@@ -60,38 +96,38 @@ class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
 
-@router.post("/google", response_model=TokenResponse)
-async def google_login(token: GoogleToken, response: Response):
+async def _sign_token_pair(token_data: dict) -> tuple:
     """
-    Authenticate user with Google OAuth token.
+    Create the (access, refresh) token pair for the given claims.
 
-    1. Verifies the Google ID token
-    2. Extracts user information
-    3. Creates JWT access token
-    4. Sets httpOnly cookie with refresh token
+    HMAC signing (HS*) takes microseconds, so it runs inline. Asymmetric
+    algorithms (RS*/ES*) are CPU-heavy, so both tokens are signed
+    concurrently in worker threads to keep the event loop free.
+    """
+    if JWT_SIGNS_INLINE:
+        return create_access_token(token_data), create_refresh_token(token_data)
+    return await asyncio.gather(
+        asyncio.to_thread(create_access_token, token_data),
+        asyncio.to_thread(create_refresh_token, token_data)
+    )
 
-    Args:
-        token: Google OAuth credential from frontend
-        response: FastAPI response object for setting cookies
 
-    Returns:
-        TokenResponse with access token and user info
+async def _issue_tokens(response: Response, user_info: dict) -> TokenResponse:
     """
-    # Verify Google token and get user info
-    user_info = verify_google_token(token.credential)
+    Create the access/refresh token pair for an authenticated user.
 
-    # Create token data
+    Sets the refresh token cookie on the response and returns the
+    TokenResponse body shared by all login endpoints.
+    """
     token_data = {
         "sub": user_info["email"],
         "name": user_info["name"],
         "picture": user_info.get("picture", "")
     }
 
-    # Create access token (30 min)
-    access_token = create_access_token(token_data)
-
-    # Create refresh token (7 days)
-    refresh_token = create_refresh_token(token_data)
+    # Create access token (30 min) and refresh token (7 days)
+    access_token, refresh_token = await _sign_token_pair(token_data)
+    await publish_user_tokens(token_data["sub"])
 
     # Set refresh token as httpOnly cookie
     _set_refresh_token_cookie(response, refresh_token)
@@ -104,8 +140,69 @@ async def google_login(token: GoogleToken, response: Response):
     )
 
 
+async def _fetch_google_userinfo(client: httpx.AsyncClient, access_token: str) -> dict:
+    """
+    Fetch the Google user profile for an OAuth access token.
+
+    Results are cached for a few minutes so retries and repeated logins with
+    the same access token skip the round-trip to Google.
+    """
+    cache_key = hashlib.sha256(access_token.encode()).digest()
+    google_user = _userinfo_cache.get(cache_key)
+    if google_user is not None:
+        return google_user
+
+    try:
+        google_response = await client.get(
+            "https://www.googleapis.com/oauth2/v2/userinfo",
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        if google_response.status_code != 200:
+            raise HTTPException(
+                status_code=401,
+                detail="Invalid Google access token"
+            )
+        google_user = orjson.loads(google_response.content)
+    except Exception as e:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Failed to verify Google token: {str(e)}"
+        )
+
+    _userinfo_cache[cache_key] = google_user
+    return google_user
+
+
+@router.post("/google", response_model=TokenResponse)
+async def google_login(token: GoogleToken, response: Response):
+    """
+    Authenticate user with Google OAuth token.
+
+    1. Verifies the Google ID token
+    2. Extracts user information
+    3. Creates JWT access token
+    4. Sets httpOnly cookie with refresh token
+
+    Args:
+        token: Google OAuth credential from frontend
+        response: FastAPI response object for setting cookies
+
+    Returns:
+        TokenResponse with access token and user info
+    """
+    # Verify Google token and get user info (RS256 plus a possible certs
+    # download: keep it off the event loop)
+    user_info = await asyncio.to_thread(verify_google_token, token.credential)
+
+    return await _issue_tokens(response, user_info)
+
+
 @router.post("/google-token", response_model=TokenResponse)
-async def google_login_with_token(token: GoogleAccessToken, response: Response):
+async def google_login_with_token(
+    token: GoogleAccessToken,
+    response: Response,
+    client: httpx.AsyncClient = Depends(get_google_client)
+):
     """
     Authenticate user with Google OAuth access token (implicit flow).
     Used when user selects account from account chooser.
@@ -115,41 +212,21 @@ async def google_login_with_token(token: GoogleAccessToken, response: Response):
     3. Creates JWT access token
     4. Sets httpOnly cookie with refresh token
     """
-    import httpx
-    from ..core.config import get_settings
-
-    settings = get_settings()
-
     # Fetch user info from Google using access token
-    async with httpx.AsyncClient() as client:
-        try:
-            google_response = await client.get(
-                "https://www.googleapis.com/oauth2/v2/userinfo",
-                headers={"Authorization": f"Bearer {token.access_token}"}
-            )
-            if google_response.status_code != 200:
-                raise HTTPException(
-                    status_code=401,
-                    detail="Invalid Google access token"
-                )
-            google_user = google_response.json()
-        except Exception as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Failed to verify Google token: {str(e)}"
-            )
+    google_user = await _fetch_google_userinfo(client, token.access_token)
 
     email = google_user.get("email", "")
     name = google_user.get("name", "")
     picture = google_user.get("picture", "")
 
     # Check email domain if configured
-    if settings.allowed_email_domain:
-        if not email.endswith(f"@{settings.allowed_email_domain}"):
-            raise HTTPException(
-                status_code=403,
-                detail=f"Email domain not allowed. Only @{settings.allowed_email_domain} emails are permitted."
-            )
+    # (domains are case-insensitive; the configured suffix is lowercase)
+    suffix = _settings.allowed_email_suffix
+    if suffix and not email.lower().endswith(suffix):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Email domain not allowed. Only {suffix} emails are permitted."
+        )
 
     user_info = {
         "email": email,
@@ -157,28 +234,7 @@ async def google_login_with_token(token: GoogleAccessToken, response: Response):
         "picture": picture
     }
 
-    # Create token data
-    token_data = {
-        "sub": email,
-        "name": name,
-        "picture": picture
-    }
-
-    # Create access token (30 min)
-    access_token = create_access_token(token_data)
-
-    # Create refresh token (7 days)
-    refresh_token = create_refresh_token(token_data)
-
-    # Set refresh token as httpOnly cookie
-    _set_refresh_token_cookie(response, refresh_token)
-
-    return TokenResponse(
-        access_token=access_token,
-        token_type="bearer",
-        expires_in=30 * 60,
-        user=user_info
-    )
+    return await _issue_tokens(response, user_info)
 
 
 @router.post("/refresh", response_model=TokenResponse)
@@ -193,7 +249,7 @@ async def refresh_access_token(request: Request, response: Response):
     Returns:
         New TokenResponse with fresh access token
     """
-    refresh_token = request.cookies.get("refresh_token")
+    refresh_token = _get_refresh_token_cookie(request)
 
     if not refresh_token:
         raise HTTPException(
@@ -202,7 +258,7 @@ async def refresh_access_token(request: Request, response: Response):
         )
 
     # Verify refresh token
-    payload = verify_jwt_token(refresh_token)
+    payload = await verify_jwt_token(refresh_token)
 
     if not payload:
         raise HTTPException(
@@ -216,33 +272,18 @@ async def refresh_access_token(request: Request, response: Response):
             detail="Invalid token type"
         )
 
-    # Create new tokens
-    token_data = {
-        "sub": payload["sub"],
+    # Create new tokens (rotates the refresh token cookie)
+    user_info = {
+        "email": payload["sub"],
         "name": payload.get("name", ""),
         "picture": payload.get("picture", "")
     }
 
-    new_access_token = create_access_token(token_data)
-    new_refresh_token = create_refresh_token(token_data)
-
-    # Update refresh token cookie
-    _set_refresh_token_cookie(response, new_refresh_token)
-
-    return TokenResponse(
-        access_token=new_access_token,
-        token_type="bearer",
-        expires_in=30 * 60,
-        user={
-            "email": payload["sub"],
-            "name": payload.get("name", ""),
-            "picture": payload.get("picture", "")
-        }
-    )
+    return await _issue_tokens(response, user_info)
 
 
 @router.post("/logout")
-async def logout(request: Request, response: Response):
+async def logout(request: Request, response: Response, background_tasks: BackgroundTasks):
     """
     Log out user by clearing cookies and blacklisting tokens.
 
@@ -253,23 +294,27 @@ async def logout(request: Request, response: Response):
     Note: Access tokens in Authorization header should also be discarded
     by the client. They will be blacklisted if provided.
 
+    Blacklisting runs as a background task after the response is sent; the
+    cookie is cleared in the response itself.
+
     Args:
         request: FastAPI request to get tokens
         response: FastAPI response to clear cookie
+        background_tasks: Runs the blacklisting after responding
 
     Returns:
         Success message
     """
     # Blacklist refresh token from cookie
-    refresh_token = request.cookies.get("refresh_token")
+    refresh_token = _get_refresh_token_cookie(request)
     if refresh_token:
-        blacklist_token(refresh_token)
+        background_tasks.add_task(blacklist_token, refresh_token)
 
     # Blacklist access token if provided in header
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
         access_token = auth_header[7:]  # Remove "Bearer " prefix
-        blacklist_token(access_token)
+        background_tasks.add_task(blacklist_token, access_token)
 
     # Clear the refresh token cookie
     response.delete_cookie(
@@ -1,7 +1,9 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import date
-from fastapi import APIRouter, Depends, Query
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from functools import lru_cache
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.core.database import get_database
 from app.core.config import get_settings
@@ -18,14 +20,25 @@ from app.schemas.metrics import (
 router = APIRouter()
 
 
-def get_ecommerce_service(
-    db: AsyncIOMotorDatabase = Depends(get_database)
-) -> EcommerceService:
-    """Dependency injection for EcommerceService."""
+@lru_cache(maxsize=1)
+def _ecommerce_service_for(db: AsyncDatabase) -> EcommerceService:
     return EcommerceService(db)
 
 
-@router.get("", response_model=EcommerceResponse)
+async def get_ecommerce_service(
+    db: AsyncDatabase = Depends(get_database)
+) -> EcommerceService:
+    """Dependency injection for EcommerceService (one instance per database handle)."""
+    return _ecommerce_service_for(db)
+
+
+# The hot read paths below return already-validated models, so they skip
+# response_model re-validation; the schema is still published via `responses`.
+@router.get(
+    "",
+    response_model=None,
+    responses={200: {"model": EcommerceResponse}}
+)
 async def get_ecommerce_metrics(
     period_type: PeriodType = Query(
         PeriodType.THIS_MONTH, 
@@ -40,7 +53,7 @@ async def get_ecommerce_metrics(
         description="End date for custom period (YYYY-MM-DD)"
     ),
     service: EcommerceService = Depends(get_ecommerce_service)
-):
+) -> EcommerceResponse:
     """
     Get ecommerce metrics for all partners.
     
@@ -61,9 +74,9 @@ async def get_ecommerce_metrics(
     return await service.get_metrics(period)
 
 
-@router.get("/partners", response_model=list)
-async def get_available_partners():
-    """Get list of available partners."""
+@lru_cache(maxsize=1)
+def _partners_response() -> List[Dict[str, Any]]:
+    """Partner list built once; it only depends on process-wide settings."""
     settings = get_settings()
     return [
         {
@@ -75,7 +88,31 @@ async def get_available_partners():
     ]
 
 
-@router.get("/partner/{partner}", response_model=EcommerceMetrics)
+@lru_cache(maxsize=256)
+def _parse_partners(partners: str) -> Tuple[str, ...]:
+    """Split and validate a comma-separated partners filter (memoized per query string)."""
+    known = frozenset(get_settings().partners)
+    parsed = tuple(p.strip().lower() for p in partners.split(","))
+    unknown = [p for p in parsed if p not in known]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown partners: {', '.join(unknown)}"
+        )
+    return parsed
+
+
+@router.get("/partners", response_model=list)
+async def get_available_partners():
+    """Get list of available partners."""
+    return _partners_response()
+
+
+@router.get(
+    "/partner/{partner}",
+    response_model=None,
+    responses={200: {"model": EcommerceMetrics}}
+)
 async def get_partner_metrics(
     partner: str,
     period_type: PeriodType = Query(
@@ -91,7 +128,7 @@ async def get_partner_metrics(
         description="End date for custom period"
     ),
     service: EcommerceService = Depends(get_ecommerce_service)
-):
+) -> EcommerceMetrics:
     """
     Get ecommerce metrics for a specific partner.
     """
@@ -104,7 +141,11 @@ async def get_partner_metrics(
     return await service.get_partner_metrics(partner, period)
 
 
-@router.get("/timeseries", response_model=TimeSeriesResponse)
+@router.get(
+    "/timeseries",
+    response_model=None,
+    responses={200: {"model": TimeSeriesResponse}}
+)
 async def get_time_series(
     period_type: PeriodType = Query(
         PeriodType.THIS_YEAR,
@@ -127,7 +168,7 @@ async def get_time_series(
         description="Comma-separated list of partners to filter"
     ),
     service: EcommerceService = Depends(get_ecommerce_service)
-):
+) -> ORJSONResponse:
     """
     Get time series metrics for charts.
     
@@ -143,15 +184,17 @@ async def get_time_series(
     # Parse partners list
     partners_list = None
     if partners:
-        partners_list = [p.strip() for p in partners.split(",")]
+        partners_list = list(_parse_partners(partners))
     
     result = await service.get_time_series(period, group_by, partners_list)
     
-    return TimeSeriesResponse(
+    # Serialize straight from the model dump: skips jsonable_encoder's
+    # Python-level walk over every TimeSeriesPoint
+    return ORJSONResponse(TimeSeriesResponse(
         group_by=group_by,
         data=result["data"],
         total_pharmacies=result["total_pharmacies"]
-    )
+    ).model_dump())
 
 
 @router.get("/partner-timeseries")
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
+from functools import lru_cache
 from fastapi import APIRouter, Depends
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.core.database import get_database
 from app.repositories.pharmacy_repository import PharmacyRepository
@@ -8,13 +9,30 @@ from app.repositories.pharmacy_repository import PharmacyRepository
 router = APIRouter()
 
 
-def get_pharmacy_repository(
-    db: AsyncIOMotorDatabase = Depends(get_database)
-) -> PharmacyRepository:
-    """Dependency injection for PharmacyRepository."""
+@lru_cache(maxsize=1)
+def _pharmacy_repository_for(db: AsyncDatabase) -> PharmacyRepository:
     return PharmacyRepository(db)
 
 
+async def get_pharmacy_repository(
+    db: AsyncDatabase = Depends(get_database)
+) -> PharmacyRepository:
+    """Dependency injection for PharmacyRepository (one instance per database handle)."""
+    return _pharmacy_repository_for(db)
+
+
+@router.get("/summary")
+async def get_pharmacies_summary(
+    repo: PharmacyRepository = Depends(get_pharmacy_repository)
+) -> Dict[str, Any]:
+    """
+    Get active count plus province, city and partner distributions.
+    
+    Same data as the four endpoints below, in a single query.
+    """
+    return await repo.get_summary()
+
+
 @router.get("/count/active")
 async def get_active_pharmacies_count(
     repo: PharmacyRepository = Depends(get_pharmacy_repository)
@@ -1,7 +1,8 @@
 from typing import Optional
 from datetime import date
+from functools import lru_cache
 from fastapi import APIRouter, Depends, Query
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.core.database import get_database
 from app.services.shortage_service import ShortageService
@@ -15,13 +16,18 @@ from app.schemas.metrics import (
 router = APIRouter()
 
 
-def get_shortage_service(
-    db: AsyncIOMotorDatabase = Depends(get_database)
-) -> ShortageService:
-    """Dependency injection for ShortageService."""
+@lru_cache(maxsize=1)
+def _shortage_service_for(db: AsyncDatabase) -> ShortageService:
     return ShortageService(db)
 
 
+async def get_shortage_service(
+    db: AsyncDatabase = Depends(get_database)
+) -> ShortageService:
+    """Dependency injection for ShortageService (one instance per database handle)."""
+    return _shortage_service_for(db)
+
+
 @router.get("", response_model=ShortageResponse)
 async def get_shortage_metrics(
     period_type: PeriodType = Query(
@@ -5,12 +5,19 @@ Endpoints for Ireland ecommerce metrics using the same service layer
 as Spain but connected to the Ireland database.
 """
 
-from typing import Optional
+import hashlib
+import re
+import time
+from typing import List, Optional
 from datetime import date
-from fastapi import APIRouter, Depends, Query, HTTPException
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from functools import lru_cache
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
+from pymongo.asynchronous.database import AsyncDatabase
 
+from app.core.config import get_settings
 from app.core.database import get_database_ireland
+from app.core.middleware import etag_matches
 from app.services.ukie_service import UkieService
 from app.schemas.metrics import (
     PeriodType,
@@ -20,17 +27,31 @@ from app.schemas.metrics import (
     TimeSeriesResponse,
 )
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
+# Separators for the comma-separated `partners` filter (surrounding spaces included)
+_PARTNER_SPLIT = re.compile(r"[,\s]+")
 
-def get_ukie_service(
-    db: AsyncIOMotorDatabase = Depends(get_database_ireland)
-) -> UkieService:
-    """Dependency injection for UkieService using Ireland database."""
+
+@lru_cache(maxsize=1)
+def _ukie_service_for(db: AsyncDatabase) -> UkieService:
     return UkieService(db)
 
 
-@router.get("", response_model=EcommerceResponse)
+async def get_ukie_service(
+    db: AsyncDatabase = Depends(get_database_ireland)
+) -> UkieService:
+    """Dependency injection for UkieService using Ireland database (one instance per handle)."""
+    return _ukie_service_for(db)
+
+
+# Services return already-validated models, so the read endpoints skip
+# response_model re-validation; the schema is still published via `responses`.
+@router.get(
+    "",
+    response_model=None,
+    responses={200: {"model": EcommerceResponse}}
+)
 async def get_ukie_metrics(
     period_type: PeriodType = Query(
         PeriodType.THIS_MONTH,
@@ -45,7 +66,7 @@ async def get_ukie_metrics(
         description="End date for custom period (YYYY-MM-DD)"
     ),
     service: UkieService = Depends(get_ukie_service)
-):
+) -> EcommerceResponse:
     """
     Get ecommerce metrics for all partners in Ireland (Ukie).
 
@@ -65,15 +86,24 @@ async def get_ukie_metrics(
     return await service.get_metrics(period)
 
 
-@router.get("/partners", response_model=list)
+@router.get(
+    "/partners",
+    response_model=None,
+    responses={200: {"model": List[str]}}
+)
 async def get_ukie_partners(
     service: UkieService = Depends(get_ukie_service)
-):
+) -> ORJSONResponse:
     """Get list of available partners in Ireland."""
-    return await service.get_available_partners()
+    # Plain strings from settings: nothing to validate or encode
+    return ORJSONResponse(await service.get_available_partners())
 
 
-@router.get("/partner/{partner}", response_model=EcommerceMetrics)
+@router.get(
+    "/partner/{partner}",
+    response_model=None,
+    responses={200: {"model": EcommerceMetrics}}
+)
 async def get_ukie_partner_metrics(
     partner: str,
     period_type: PeriodType = Query(
@@ -89,7 +119,7 @@ async def get_ukie_partner_metrics(
         description="End date for custom period"
     ),
     service: UkieService = Depends(get_ukie_service)
-):
+) -> EcommerceMetrics:
     """
     Get ecommerce metrics for a specific partner in Ireland.
     """
@@ -102,7 +132,11 @@ async def get_ukie_partner_metrics(
     return await service.get_partner_metrics(partner, period)
 
 
-@router.get("/timeseries", response_model=TimeSeriesResponse)
+@router.get(
+    "/timeseries",
+    response_model=None,
+    responses={200: {"model": TimeSeriesResponse}}
+)
 async def get_ukie_time_series(
     period_type: PeriodType = Query(
         PeriodType.THIS_YEAR,
@@ -125,7 +159,7 @@ async def get_ukie_time_series(
         description="Comma-separated list of partners to filter"
     ),
     service: UkieService = Depends(get_ukie_service)
-):
+) -> ORJSONResponse:
     """
     Get time series metrics for Ireland charts.
 
@@ -141,19 +175,34 @@ async def get_ukie_time_series(
     # Parse partners list
     partners_list = None
     if partners:
-        partners_list = [p.strip() for p in partners.split(",")]
+        partners_list = [p for p in _PARTNER_SPLIT.split(partners) if p]
 
     result = await service.get_time_series(period, group_by, partners_list)
 
-    return TimeSeriesResponse(
+    # Serialize straight from the model dump, skipping jsonable_encoder
+    return ORJSONResponse(TimeSeriesResponse(
         group_by=group_by,
         data=result["data"],
         total_pharmacies=result["total_pharmacies"]
-    )
+    ).model_dump())
+
+
+def _partner_time_series_etag(*params: object) -> bytes:
+    """
+    Weak ETag for a partner time series, derived from the query alone.
+
+    Mixes in the current metrics-cache TTL window, so a tag is reused only
+    while the service would serve the same cached result anyway; clients
+    may be up to one TTL behind, exactly as with the results cache.
+    """
+    window = int(time.time()) // get_settings().metrics_cache_ttl_seconds
+    key = "|".join(map(str, (*params, window))).encode()
+    return b'W/"' + hashlib.blake2b(key, digest_size=8).hexdigest().encode() + b'"'
 
 
 @router.get("/partner-timeseries")
 async def get_ukie_partner_time_series(
+    request: Request,
     period_type: PeriodType = Query(
         PeriodType.THIS_YEAR,
         description="Period type for filtering"
@@ -176,11 +225,22 @@ async def get_ukie_partner_time_series(
     Get time series metrics grouped by partner for Ireland stacked charts.
 
     Returns orders and GMV data organized by period with partner breakdown.
+    Answers a matching If-None-Match with 304 before running the aggregation.
     """
+    etag = _partner_time_series_etag(period_type.value, start_date, end_date, group_by)
+    headers = {"ETag": etag.decode(), "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match.encode(), etag):
+        return Response(status_code=304, headers=headers)
+
     period = PeriodFilter(
         period_type=period_type,
         start_date=start_date,
         end_date=end_date
     )
 
-    return await service.get_partner_time_series(period, group_by)
+    return ORJSONResponse(
+        await service.get_partner_time_series(period, group_by),
+        headers=headers
+    )
@@ -0,0 +1,121 @@
+"""
+In-process TTL caches for service-layer results, plus an optional Redis
+cache shared by all workers for repository query results.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from cachetools import TTLCache
+import orjson
+
+from .config import get_settings
+from .redis_client import get_redis, RedisError
+
+logger = logging.getLogger(__name__)
+
+# Computations currently running, keyed by (id(cache), key)
+_inflight: Dict[Tuple[int, Hashable], "asyncio.Future[Any]"] = {}
+
+
+def results_cache(maxsize: int = 256) -> TTLCache:
+    """Create a TTL cache using the configured metrics cache TTL."""
+    return TTLCache(maxsize=maxsize, ttl=get_settings().metrics_cache_ttl_seconds)
+
+
+async def _compute_and_store(
+    cache: TTLCache,
+    key: Hashable,
+    compute: Callable[[], Awaitable[Any]]
+) -> Any:
+    value = await compute()
+    cache[key] = value
+    return value
+
+
+async def cached(
+    cache: TTLCache,
+    key: Hashable,
+    compute: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Return cache[key], computing and storing it on a miss.
+
+    Concurrent misses for the same key share a single computation, so a
+    burst of identical dashboard requests on a cold cache runs one query.
+    The shared task is shielded: a cancelled caller doesn't abort it for
+    the others. Errors reach every waiter and are not cached.
+
+    Args:
+        cache: Cache to read from / write to
+        key: Hashable cache key
+        compute: Zero-argument coroutine function producing the value
+
+    Returns:
+        The cached or freshly computed value
+    """
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+
+    flight_key = (id(cache), key)
+    task = _inflight.get(flight_key)
+    if task is None:
+        task = asyncio.ensure_future(_compute_and_store(cache, key, compute))
+        _inflight[flight_key] = task
+        task.add_done_callback(lambda _: _inflight.pop(flight_key, None))
+    return await asyncio.shield(task)
+
+
+def shared_cache_ttl(end_date: Optional[datetime]) -> int:
+    """
+    TTL for a shared query result ending at end_date (naive UTC).
+
+    Periods that ended more than a day ago no longer change, so they are
+    kept longer than open ones (or ones without an end date).
+    """
+    settings = get_settings()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    if end_date is not None and end_date < now - timedelta(days=1):
+        return settings.closed_period_cache_ttl_seconds
+    return settings.metrics_cache_ttl_seconds
+
+
+async def shared_cached(
+    key: str,
+    ttl: int,
+    compute: Callable[[], Awaitable[Any]]
+) -> Any:
+    """
+    Return the JSON value stored in Redis under key, computing it on a miss.
+
+    Without Redis this just runs compute(). Redis errors are logged and
+    fall back to computing, so the cache never fails a request.
+
+    Args:
+        key: Redis key
+        ttl: Expiry of a stored value, in seconds
+        compute: Zero-argument coroutine function producing a JSON-serializable value
+
+    Returns:
+        The cached or freshly computed value
+    """
+    redis = get_redis()
+    if redis is None:
+        return await compute()
+
+    try:
+        raw = await redis.get(key)
+    except RedisError as e:
+        logger.warning(f"Redis cache read failed: {e}")
+        return await compute()
+    if raw is not None:
+        return orjson.loads(raw)
+
+    value = await compute()
+    try:
+        await redis.set(key, orjson.dumps(value), ex=ttl)
+    except RedisError as e:
+        logger.warning(f"Redis cache write failed: {e}")
+    return value
@@ -1,7 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from functools import lru_cache
-from typing import List, Optional
+from functools import cached_property
+from typing import Dict, FrozenSet, List, Optional, Tuple
 import os
 import secrets
 
@@ -21,6 +21,22 @@ class Settings(BaseSettings):
     mongodb_url_ireland: str = ""  # Set via MONGODB_URL_IRELAND in .env
     database_name_ireland: str = "LudaFarma-Ireland"
 
+    # MongoDB connection pool tuning (applied to both clients).
+    # TCP keepalive is always on in PyMongo 4. zstd/snappy compressors need
+    # the zstandard / python-snappy packages; zlib works out of the box.
+    mongodb_max_pool_size: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", "200"))
+    mongodb_min_pool_size: int = int(os.getenv("MONGODB_MIN_POOL_SIZE", "20"))
+    mongodb_wait_queue_timeout_ms: int = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+    mongodb_max_idle_time_ms: int = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+    mongodb_compressors: str = os.getenv("MONGODB_COMPRESSORS", "zlib")
+    # Create the indexes the dashboard queries need at startup
+    mongodb_ensure_indexes: bool = os.getenv("MONGODB_ENSURE_INDEXES", "true").lower() == "true"
+
+    # Optional Redis for state shared across workers (token revocation,
+    # booking and pharmacy query results). Empty = keep that state in-process.
+    redis_url: str = os.getenv("REDIS_URL", "")
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+
     # JWT Configuration
     jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "")
     jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
@@ -54,27 +70,44 @@ class Settings(BaseSettings):
     # Allowed email domain for authentication (e.g., "ludapartners.com")
     allowed_email_domain: Optional[str] = os.getenv("ALLOWED_EMAIL_DOMAIN")
 
-    # CORS Configuration - parsed from comma-separated string
-    @property
+    @cached_property
+    def allowed_email_suffix(self) -> Optional[str]:
+        """Lowercase '@domain' suffix for email checks, or None when no domain is enforced."""
+        return f"@{self.allowed_email_domain.lower()}" if self.allowed_email_domain else None
+
+    # CORS Configuration - parsed from comma-separated string (once per process)
+    @cached_property
     def cors_origins(self) -> List[str]:
         """Parse CORS origins from environment variable (comma-separated)."""
         origins = os.getenv("CORS_ORIGINS_RAW", "http://localhost:5173,http://localhost:3000")
         return [o.strip() for o in origins.split(",") if o.strip()]
 
+    # API modules whose routers are mounted (comma-separated, once per process)
+    @cached_property
+    def enabled_modules(self) -> Tuple[str, ...]:
+        """Names of the app.api modules to load; all of them by default."""
+        modules = os.getenv("ENABLED_MODULES", "ecommerce,shortage,pharmacies,auth,ukie")
+        return tuple(m.strip().lower() for m in modules.split(",") if m.strip())
+
     # Environment
     environment: str = os.getenv("ENVIRONMENT", "development")
 
     # Cookie security - only use secure cookies in production (HTTPS)
-    @property
+    @cached_property
     def cookie_secure(self) -> bool:
         """Use secure cookies only in production (requires HTTPS)."""
         return self.environment == "production"
 
-    @property
+    @cached_property
     def cookie_samesite(self) -> str:
         """SameSite cookie policy - lax for development, strict for production."""
         return "strict" if self.environment == "production" else "lax"
     
+    # TTL (seconds) for cached service-layer metrics results
+    metrics_cache_ttl_seconds: int = int(os.getenv("METRICS_CACHE_TTL_SECONDS", "60"))
+    # TTL (seconds) for shared aggregate results of periods that ended over a day ago
+    closed_period_cache_ttl_seconds: int = int(os.getenv("CLOSED_PERIOD_CACHE_TTL_SECONDS", "3600"))
+
     # Cancelled state ID
     cancelled_state_id: str = "5a54c525b2948c860f00000d"
     
@@ -86,7 +119,7 @@ class Settings(BaseSettings):
     ]
     
     # Partners without tags (can't calculate % active pharmacies)
-    partners_without_tags: List[str] = ["uber", "justeat"]
+    partners_without_tags: FrozenSet[str] = frozenset({"uber", "justeat"})
 
     # Ireland-specific partners (Ukie)
     partners_ireland: List[str] = [
@@ -95,17 +128,17 @@ class Settings(BaseSettings):
     ]
     
     # Partner tag mappings (partner name -> possible tags in pharmacies)
-    partner_tags: dict = {
-        "glovo": ["GLOVO"],
-        "glovo-otc": ["GLOVO-OTC_2H", "GLOVO-OTC_48H"],
-        "amazon": ["AMAZON_2H", "AMAZON_48H"],
-        "carrefour": ["CARREFOUR_2H", "CARREFOUR_48H"],
-        "danone": ["DANONE_2H", "DANONE_48H"],
-        "procter": ["PROCTER_2H", "PROCTER_48H"],
-        "enna": ["ENNA_2H", "ENNA_48H"],
-        "nordic": ["NORDIC_2H", "NORDIC_48H"],
-        "chiesi": ["CHIESI_48H", "CHIESI_BACKUP"],
-        "ferrer": ["FERRER_2H", "FERRER_48H"],
+    partner_tags: Dict[str, Tuple[str, ...]] = {
+        "glovo": ("GLOVO",),
+        "glovo-otc": ("GLOVO-OTC_2H", "GLOVO-OTC_48H"),
+        "amazon": ("AMAZON_2H", "AMAZON_48H"),
+        "carrefour": ("CARREFOUR_2H", "CARREFOUR_48H"),
+        "danone": ("DANONE_2H", "DANONE_48H"),
+        "procter": ("PROCTER_2H", "PROCTER_48H"),
+        "enna": ("ENNA_2H", "ENNA_48H"),
+        "nordic": ("NORDIC_2H", "NORDIC_48H"),
+        "chiesi": ("CHIESI_48H", "CHIESI_BACKUP"),
+        "ferrer": ("FERRER_2H", "FERRER_48H"),
     }
     
     class Config:
@@ -114,7 +147,10 @@ class Settings(BaseSettings):
         extra = "ignore"  # Ignore extra env vars not defined in the model
 
 
-@lru_cache()
+# Settings are immutable for the process lifetime: build them once at import
+_settings = Settings()
+
+
 def get_settings() -> Settings:
-    """Get cached settings instance (Singleton pattern)."""
-    return Settings()
+    """Get the settings instance (Singleton pattern)."""
+    return _settings
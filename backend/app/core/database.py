@@ -1,4 +1,6 @@
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import asyncio
+from pymongo import ASCENDING, AsyncMongoClient, IndexModel
+from pymongo.asynchronous.database import AsyncDatabase
 from typing import Optional
 import logging
 
@@ -11,26 +13,102 @@ class Database:
     """Database connection manager following Singleton pattern."""
 
     # Spain (PRO) database
-    client: Optional[AsyncIOMotorClient] = None
-    db: Optional[AsyncIOMotorDatabase] = None
+    client: Optional[AsyncMongoClient] = None
+    db: Optional[AsyncDatabase] = None
 
     # Ireland (Ukie) database
-    client_ireland: Optional[AsyncIOMotorClient] = None
-    db_ireland: Optional[AsyncIOMotorDatabase] = None
+    client_ireland: Optional[AsyncMongoClient] = None
+    db_ireland: Optional[AsyncDatabase] = None
 
 
 db = Database()
 
+# Collections hit by the dashboard endpoints, touched once at startup
+_WARMUP_COLLECTIONS = ("bookings", "pharmacies")
+
+# Case-insensitive string comparison (strength 2 ignores case only). Partner
+# filters on thirdUser.user run with this collation, so they are plain
+# equality matches the index below can serve, instead of anchored /i regexes.
+PARTNER_COLLATION = {"locale": "en", "strength": 2}
+
+# Indexes the booking pipelines rely on (see BookingRepository)
+_BOOKING_INDEXES = [
+    IndexModel(
+        [("thirdUser.user", ASCENDING), ("createdDate", ASCENDING)],
+        name="partner_createdDate",
+        collation=PARTNER_COLLATION,
+    ),
+    # Shortage bookings only (those with an origin pharmacy)
+    IndexModel(
+        [("createdDate", ASCENDING)],
+        name="shortage_createdDate",
+        partialFilterExpression={"origin": {"$exists": True}},
+    ),
+    # All-time pharmacy count (get_total_pharmacies without dates): the
+    # partner, origin and target filters plus the group on target are all
+    # answered from the index, with no date to range over
+    IndexModel(
+        [("thirdUser.user", ASCENDING), ("origin", ASCENDING), ("target", ASCENDING)],
+        name="partner_origin_target",
+        collation=PARTNER_COLLATION,
+        partialFilterExpression={"thirdUser.user": {"$exists": True}},
+    ),
+]
+
+
+def _client_options(settings) -> dict:
+    """Connection and pool options shared by the Spain and Ireland clients."""
+    options = {
+        "serverSelectionTimeoutMS": 5000,
+        "connectTimeoutMS": 5000,
+        "maxPoolSize": settings.mongodb_max_pool_size,
+        "minPoolSize": settings.mongodb_min_pool_size,
+        "waitQueueTimeoutMS": settings.mongodb_wait_queue_timeout_ms,
+        "maxIdleTimeMS": settings.mongodb_max_idle_time_ms,
+    }
+    if settings.mongodb_compressors:
+        options["compressors"] = settings.mongodb_compressors
+    return options
+
+
+async def _warm_up(database: AsyncDatabase) -> None:
+    """
+    Open pooled connections and resolve the collections before serving traffic.
+
+    A cheap estimated_document_count per collection, run concurrently, so the
+    first burst of requests doesn't wait on pool growth. Failures are only
+    logged: the ping already proved the server is reachable.
+    """
+    results = await asyncio.gather(
+        *(database[name].estimated_document_count() for name in _WARMUP_COLLECTIONS),
+        return_exceptions=True
+    )
+    for name, result in zip(_WARMUP_COLLECTIONS, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Warm-up of {database.name}.{name} failed: {result}")
+
+
+async def _ensure_indexes(database: AsyncDatabase) -> None:
+    """
+    Create the booking indexes if missing (a no-op when they already exist).
+
+    Disabled with MONGODB_ENSURE_INDEXES=false, e.g. when the app user lacks
+    createIndex rights; failures are only logged.
+    """
+    try:
+        await database["bookings"].create_indexes(_BOOKING_INDEXES)
+    except Exception as e:
+        logger.warning(f"Could not create indexes on {database.name}.bookings: {e}")
+
 
 async def connect_to_mongo() -> None:
     """Establish connection to MongoDB databases."""
     settings = get_settings()
 
     # Connect to Spain (PRO) database
-    db.client = AsyncIOMotorClient(
+    db.client = AsyncMongoClient(
         settings.mongodb_url,
-        serverSelectionTimeoutMS=5000,
-        connectTimeoutMS=5000
+        **_client_options(settings)
     )
     db.db = db.client[settings.database_name]
 
@@ -42,20 +120,25 @@ async def connect_to_mongo() -> None:
         logger.error(f"Failed to connect to MongoDB (Spain): {e}")
         raise
 
+    if settings.mongodb_ensure_indexes:
+        await _ensure_indexes(db.db)
+    await _warm_up(db.db)
+
     # Connect to Ireland (Ukie) database if configured
     if settings.mongodb_url_ireland:
         try:
-            db.client_ireland = AsyncIOMotorClient(
+            db.client_ireland = AsyncMongoClient(
                 settings.mongodb_url_ireland,
-                serverSelectionTimeoutMS=5000,
-                connectTimeoutMS=5000,
-                maxPoolSize=10
+                **_client_options(settings)
             )
             db.db_ireland = db.client_ireland[settings.database_name_ireland]
 
             # Test Ireland connection
             await db.client_ireland.admin.command('ping')
             logger.info(f"Connected to MongoDB (Ireland): {settings.database_name_ireland}")
+            if settings.mongodb_ensure_indexes:
+                await _ensure_indexes(db.db_ireland)
+            await _warm_up(db.db_ireland)
         except Exception as e:
             logger.warning(f"Failed to connect to MongoDB (Ireland): {e}")
             logger.warning("Ukie features will be unavailable")
@@ -66,22 +149,25 @@ async def connect_to_mongo() -> None:
 async def close_mongo_connection() -> None:
     """Close all MongoDB connections."""
     if db.client:
-        db.client.close()
+        await db.client.close()
         logger.info("Closed MongoDB connection (Spain)")
 
     if db.client_ireland:
-        db.client_ireland.close()
+        await db.client_ireland.close()
         logger.info("Closed MongoDB connection (Ireland)")
 
 
-def get_database() -> AsyncIOMotorDatabase:
+# Dependencies below are async (though they never await) so FastAPI calls
+# them inline instead of dispatching each one to the threadpool.
+
+async def get_database() -> AsyncDatabase:
     """Get Spain database instance for dependency injection."""
     if db.db is None:
         raise RuntimeError("Database not initialized. Call connect_to_mongo() first.")
     return db.db
 
 
-def get_database_ireland() -> AsyncIOMotorDatabase:
+async def get_database_ireland() -> AsyncDatabase:
     """Get Ireland database instance for dependency injection."""
     if db.db_ireland is None:
         raise RuntimeError("Ireland database not available. Check MONGODB_URL_IRELAND configuration.")
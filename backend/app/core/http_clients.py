@@ -0,0 +1,39 @@
+import httpx
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClients:
+    """Shared outbound HTTP clients, reused across requests."""
+
+    # Google OAuth APIs (userinfo)
+    google: Optional[httpx.AsyncClient] = None
+
+
+http_clients = HTTPClients()
+
+
+async def open_http_clients() -> None:
+    """Create the shared HTTP clients (keeps TCP/TLS connections pooled)."""
+    http_clients.google = httpx.AsyncClient(
+        timeout=httpx.Timeout(5.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+    )
+    logger.info("HTTP clients initialized")
+
+
+async def close_http_clients() -> None:
+    """Close all shared HTTP clients."""
+    if http_clients.google:
+        await http_clients.google.aclose()
+        http_clients.google = None
+        logger.info("Closed HTTP clients")
+
+
+def get_google_client() -> httpx.AsyncClient:
+    """Get the Google API client for dependency injection."""
+    if http_clients.google is None:
+        raise RuntimeError("HTTP clients not initialized. Call open_http_clients() first.")
+    return http_clients.google
@@ -0,0 +1,245 @@
+"""
+ASGI middlewares shared by the API.
+"""
+import hashlib
+import logging
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .redis_client import get_redis, RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class ETagMiddleware:
+    """
+    Weak ETag / If-None-Match support for read-only GET endpoints.
+
+    Buffers successful GET responses under the given path prefixes, tags them
+    with a BLAKE2b hash of the body and answers a matching If-None-Match with
+    an empty 304, so dashboards polling unchanged data skip the payload.
+    Responses that already carry an ETag are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefixes: Iterable[str]):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.path_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value
+                break
+
+        start: Message = {}
+        body: List[bytes] = []
+        passthrough = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                if message["status"] != 200 or any(k == b"etag" for k, _ in headers):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            payload = b"".join(body)
+            etag = b'W/"' + hashlib.blake2b(payload, digest_size=16).hexdigest().encode() + b'"'
+            headers: List[Tuple[bytes, bytes]] = [
+                (k, v) for k, v in start.get("headers", []) if k != b"content-length"
+            ]
+            headers.append((b"etag", etag))
+            headers.append((b"cache-control", b"private, no-cache"))
+
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                await send({"type": "http.response.start", "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            headers.append((b"content-length", str(len(payload)).encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": payload})
+
+        await self.app(scope, receive, send_with_etag)
+
+
+def etag_matches(if_none_match: bytes, etag: bytes) -> bool:
+    """Weak comparison of an If-None-Match header value against an ETag."""
+    if if_none_match.strip() == b"*":
+        return True
+    opaque = etag[2:]  # drop the W/ prefix
+    for candidate in if_none_match.split(b","):
+        candidate = candidate.strip()
+        if candidate.startswith(b"W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+# Sliding-window counter in Redis: INCR this minute's key (expiring after two
+# windows) and read the previous minute's count in one atomic round-trip.
+_RATE_LIMIT_SCRIPT = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then redis.call('EXPIRE', KEYS[1], 120) end
+return {current, tonumber(redis.call('GET', KEYS[2]) or '0')}
+"""
+
+
+class RateLimiter:
+    """
+    Per-IP sliding-window counter.
+
+    Keeps the request count of the current and previous minute per client and
+    weights the previous one by how much of it still overlaps the last 60 s.
+    With Redis configured the counters live there (rl:<ip>:<minute>), so the
+    limit holds across all workers; otherwise, or if Redis errors, they are
+    kept in-process. The local path needs no lock because it never awaits.
+    """
+
+    def __init__(self, requests_per_minute: int = 60):
+        self.requests_per_minute = requests_per_minute
+        self._window = 0
+        # client_ip -> [window, current_count, previous_count]
+        self._counts: Dict[str, List[int]] = {}
+        self._script = None
+        self._script_client = None
+
+    async def is_allowed(self, client_ip: str) -> bool:
+        now = time.time()
+        window = int(now // 60)
+        previous_weight = 1 - (now % 60) / 60
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                current, previous = await self._redis_counts(redis, client_ip, window)
+            except RedisError as e:
+                logger.warning(f"Redis rate limit check failed: {e}")
+            else:
+                # INCR already counted this request
+                return current - 1 + previous * previous_weight < self.requests_per_minute
+
+        return self._is_allowed_local(client_ip, window, previous_weight)
+
+    async def _redis_counts(self, redis, client_ip: str, window: int) -> Tuple[int, int]:
+        if self._script_client is not redis:
+            # Script objects run via EVALSHA, loading the script on first use
+            self._script = redis.register_script(_RATE_LIMIT_SCRIPT)
+            self._script_client = redis
+        current, previous = await self._script(
+            keys=[f"rl:{client_ip}:{window}", f"rl:{client_ip}:{window - 1}"]
+        )
+        return int(current), int(previous)
+
+    def _is_allowed_local(self, client_ip: str, window: int, previous_weight: float) -> bool:
+        if window != self._window:
+            # Once per minute: forget clients idle for more than a window
+            self._window = window
+            self._counts = {
+                ip: entry for ip, entry in self._counts.items()
+                if entry[0] >= window - 1
+            }
+
+        entry = self._counts.get(client_ip)
+        if entry is None:
+            entry = self._counts[client_ip] = [window, 0, 0]
+        elif entry[0] != window:
+            entry[2] = entry[1] if entry[0] == window - 1 else 0
+            entry[1] = 0
+            entry[0] = window
+
+        if entry[1] + entry[2] * previous_weight >= self.requests_per_minute:
+            return False
+
+        entry[1] += 1
+        return True
+
+
+class RateLimitMiddleware:
+    """
+    Per-client rate limiting as plain ASGI middleware.
+
+    The client is scope["client"]: behind the reverse proxy, uvicorn's
+    --proxy-headers has already resolved it from X-Forwarded-For, and only
+    for trusted proxies. Exempt paths and CORS preflights (OPTIONS, answered
+    by CORSMiddleware) skip the limiter; rejected requests get a 429 without
+    reaching the app.
+    """
+
+    def __init__(self, app: ASGIApp, limiter, exempt_paths: Iterable[str] = ()):
+        self.app = app
+        self.limiter = limiter
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in self.exempt_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_ip = client[0] if client else ""
+
+        if not await self.limiter.is_allowed(client_ip):
+            logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+            response = ORJSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests. Please try again later."}
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
+class SecurityHeadersMiddleware:
+    """
+    Append a fixed list of (already encoded) headers to every HTTP response.
+
+    CORS preflight (OPTIONS) responses are left alone: they carry no content
+    for the headers to protect.
+    """
+
+    def __init__(self, app: ASGIApp, headers: Iterable[Tuple[bytes, bytes]]):
+        self.app = app
+        self.headers = list(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *self.headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
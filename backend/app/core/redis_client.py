@@ -0,0 +1,55 @@
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from typing import Optional
+import logging
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class RedisClients:
+    """Shared Redis client (optional; only used when REDIS_URL is set)."""
+
+    client: Optional[Redis] = None
+
+
+redis_clients = RedisClients()
+
+
+async def connect_to_redis() -> None:
+    """Connect to Redis if configured; otherwise state stays in-process."""
+    settings = get_settings()
+    if not settings.redis_url:
+        logger.info("REDIS_URL not set - token revocation and query cache are per-process")
+        return
+
+    client = Redis.from_url(
+        settings.redis_url,
+        max_connections=settings.redis_max_connections,
+        socket_timeout=1.0,
+        socket_connect_timeout=2.0
+    )
+    try:
+        await client.ping()
+    except RedisError as e:
+        logger.warning(f"Failed to connect to Redis: {e}")
+        logger.warning("Token revocation and query cache will be per-process")
+        await client.aclose()
+        return
+
+    redis_clients.client = client
+    logger.info("Connected to Redis")
+
+
+async def close_redis_connection() -> None:
+    """Close the Redis connection pool."""
+    if redis_clients.client:
+        await redis_clients.client.aclose()
+        redis_clients.client = None
+        logger.info("Closed Redis connection")
+
+
+def get_redis() -> Optional[Redis]:
+    """Get the shared Redis client, or None when Redis is not in use."""
+    return redis_clients.client
@@ -1,121 +1,304 @@
 """
 Security module for JWT and Google OAuth authentication.
 """
-from datetime import datetime, timedelta
-from typing import Optional, Set
-from jose import JWTError, jwt
+from datetime import timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+from cachetools import TTLCache
+import jwt
 from fastapi import HTTPException, status, Request
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.security import HTTPBearer
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
+import asyncio
+import hashlib
+import heapq
 import os
+import requests
+import secrets
 import threading
+import time
+import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Configuration from settings (loaded from .env via pydantic)
 from .config import get_settings
+from .redis_client import get_redis, RedisError
 
 
 # =============================================================================
 # TOKEN BLACKLIST SYSTEM
 # =============================================================================
-# Simple in-memory blacklist with automatic cleanup
-# For production with multiple instances, use Redis instead
+# Simple in-memory blacklist with automatic cleanup, keyed by the token's
+# jti claim (see _revocation_id) rather than the full token.
+# When Redis is configured, revocations are also written there (see
+# _is_revoked / blacklist_token) so every worker and instance sees them.
+
+# Longest-lived token we issue (refresh tokens: 7 days)
+_MAX_TOKEN_LIFETIME_SECONDS = 7 * 24 * 60 * 60
 
 class TokenBlacklist:
     """
     Thread-safe token blacklist for JWT revocation.
-    Stores token JTIs (JWT IDs) or full tokens with expiration cleanup.
+    Stores token IDs (jti) with expiration cleanup.
+
+    Lookups never take the lock. The lock only serializes writers (add and
+    the periodic cleanup), and add() holds it for a set insert and a heap
+    push only; expired entries are purged by run_blacklist_cleanup.
+
+    Issued tokens are also indexed by user (see track), so revoking every
+    token of one user touches only that user's entries.
     """
 
     def __init__(self):
         self._blacklist: Set[str] = set()
-        self._expiry_times: dict = {}  # token -> expiry_timestamp
+        self._expiry_times: Dict[str, int] = {}  # token -> expiry (epoch seconds)
+        # Min-heap of (expiry, token), so cleanup only touches expired entries
+        self._expiry_heap: List[Tuple[int, str]] = []
+        # user email -> {token id: expiry} for tokens issued by this worker
+        self._by_user: Dict[str, Dict[str, int]] = {}
+        # Min-heap of (expiry, user email, token id) over _by_user
+        self._issued_heap: List[Tuple[int, str, str]] = []
         self._lock = threading.Lock()
 
-    def add(self, token: str, expires_at: datetime) -> None:
+    def add(self, token: str, expires_at: int) -> None:
         """Add a token to the blacklist."""
         with self._lock:
             self._blacklist.add(token)
             self._expiry_times[token] = expires_at
-            self._cleanup_expired()
+            heapq.heappush(self._expiry_heap, (expires_at, token))
+
+    def track(self, token: str, expires_at: int, user_email: str) -> None:
+        """Record an issued token under its user, for revoke_all_for_user."""
+        with self._lock:
+            self._by_user.setdefault(user_email, {})[token] = expires_at
+            heapq.heappush(self._issued_heap, (expires_at, user_email, token))
+
+    def tokens_for_user(self, user_email: str) -> List[str]:
+        """Token IDs issued to a user (by this worker) that haven't expired yet."""
+        return list(self._by_user.get(user_email, ()))
 
     def is_blacklisted(self, token: str) -> bool:
         """Check if a token is blacklisted."""
+        # Lock-free: a set lookup is atomic under the GIL. Entries that have
+        # expired but not been cleaned up yet belong to tokens that fail
+        # their own exp check anyway.
+        return token in self._blacklist
+
+    def cleanup_expired(self) -> None:
+        """Drop expired entries (run periodically, see run_blacklist_cleanup)."""
         with self._lock:
             self._cleanup_expired()
-            return token in self._blacklist
 
     def _cleanup_expired(self) -> None:
         """Remove expired tokens from blacklist to prevent memory growth."""
-        now = datetime.utcnow()
-        expired = [
-            token for token, exp_time in self._expiry_times.items()
-            if exp_time < now
-        ]
-        for token in expired:
-            self._blacklist.discard(token)
-            del self._expiry_times[token]
-
-    def revoke_all_for_user(self, user_email: str) -> int:
+        now = int(time.time())
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now:
+            exp_time, token = heapq.heappop(heap)
+            # Skip stale heap entries for tokens re-added with a later expiry
+            if self._expiry_times.get(token) == exp_time:
+                self._blacklist.discard(token)
+                del self._expiry_times[token]
+
+        issued = self._issued_heap
+        while issued and issued[0][0] < now:
+            exp_time, user_email, token = heapq.heappop(issued)
+            tokens = self._by_user.get(user_email)
+            if tokens is not None and tokens.get(token) == exp_time:
+                del tokens[token]
+                if not tokens:
+                    del self._by_user[user_email]
+
+    def revoke_all_for_user(self, user_email: str) -> Dict[str, int]:
         """
-        Revoke all tokens for a specific user.
-        Note: This requires storing user info with tokens - simplified version.
-        Returns count of revoked tokens.
+        Revoke all tokens tracked for a specific user.
+        Returns the revoked token IDs with their expiry (epoch seconds).
         """
-        # In a full implementation, you'd track user -> tokens mapping
-        # For now, this is a placeholder for future enhancement
-        logger.info(f"Token revocation requested for user: {user_email}")
-        return 0
+        with self._lock:
+            tokens = self._by_user.pop(user_email, {})
+            for token, expires_at in tokens.items():
+                self._blacklist.add(token)
+                self._expiry_times[token] = expires_at
+                heapq.heappush(self._expiry_heap, (expires_at, token))
+        return tokens
 
 
 # Global blacklist instance
 token_blacklist = TokenBlacklist()
 
-def _get_jwt_secret_key():
-    return get_settings().jwt_secret_key
 
-def _get_jwt_algorithm():
-    return get_settings().jwt_algorithm
+async def run_blacklist_cleanup(interval_seconds: float = 60) -> None:
+    """Periodically purge expired blacklist entries; runs until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        token_blacklist.cleanup_expired()
+
+# Redis keys: auth:revoked:<jti>, expiring with the token itself
+_REVOKED_KEY_PREFIX = "auth:revoked:"
+# Redis sets: auth:user_tokens:<email> -> jti of every token issued to the user
+_USER_TOKENS_KEY_PREFIX = "auth:user_tokens:"
+
+# Token IDs Redis recently reported as not revoked. Saves a round-trip per
+# request; a revocation made by another worker is seen within this TTL.
+_not_revoked: TTLCache = TTLCache(maxsize=10000, ttl=5)
+
+
+async def _is_revoked(token_id: str) -> bool:
+    """Check the local blacklist, then Redis (if configured)."""
+    if token_blacklist.is_blacklisted(token_id):
+        return True
+
+    redis = get_redis()
+    if redis is None or token_id in _not_revoked:
+        return False
+
+    try:
+        revoked = await redis.exists(_REVOKED_KEY_PREFIX + token_id)
+    except RedisError as e:
+        # Fail open: the local blacklist above still applies
+        logger.warning(f"Redis revocation check failed: {e}")
+        return False
+
+    if not revoked:
+        _not_revoked[token_id] = True
+    return bool(revoked)
+
+
+# =============================================================================
+# VERIFIED TOKEN CACHE
+# =============================================================================
+# Decoded payloads of recently verified tokens, so protected routes don't
+# re-run signature verification on every request. Keys are a keyed BLAKE2b
+# digest of the whole token (never the raw token) and entries are dropped
+# when a token is blacklisted.
+
+_verified_tokens: TTLCache = TTLCache(maxsize=10000, ttl=30)
+
+# Per-process key for cache digests; the cache never leaves the process.
+_token_cache_hash_key = secrets.token_bytes(32)
+
+
+def _token_cache_key(token: str) -> bytes:
+    """16-byte keyed BLAKE2b digest of the token, binding all three segments."""
+    return hashlib.blake2b(
+        token.encode(), digest_size=16, key=_token_cache_hash_key
+    ).digest()
+
+
+def _token_signature(token: str) -> str:
+    """Signature segment of a JWT, already a MAC over the rest of the token."""
+    return token.rsplit(".", 1)[-1]
+
+
+def _revocation_id(token: str, payload: dict) -> str:
+    """
+    Blacklist key for a token: its jti claim.
 
-def _get_jwt_expiration_minutes():
-    return get_settings().jwt_expiration_minutes
+    Tokens issued before jti was added fall back to their signature segment.
+    """
+    return payload.get("jti") or _token_signature(token)
+
+# Settings are process-wide and immutable: bind what the JWT paths read once
+_settings = get_settings()
+_JWT_SECRET_KEY = _settings.jwt_secret_key
+_JWT_ALGORITHM = _settings.jwt_algorithm
+_JWT_EXPIRATION_MINUTES = _settings.jwt_expiration_minutes
+
+# HMAC (HS*) signatures take microseconds and are handled inline; RS*/ES*
+# cost around a millisecond and go to a worker thread instead.
+JWT_SIGNS_INLINE = _JWT_ALGORITHM.startswith("HS")
 
-def _get_google_client_id():
-    return get_settings().google_client_id
+# Shared encoder/decoder; keys below are prepared once so PyJWT's
+# per-call prepare_key is a pass-through.
+_jwt_codec = jwt.PyJWT()
 
-def _get_allowed_email_domain():
-    return get_settings().allowed_email_domain
+@lru_cache(maxsize=1)
+def _get_jwt_signing_key():
+    """
+    Signing key object for the configured secret/algorithm, built once.
+
+    jwt.encode would otherwise call prepare_key (parsing PEM keys for
+    RS*/ES*) on every token it signs; prepared keys are passed through as-is.
+    """
+    return jwt.get_algorithm_by_name(_JWT_ALGORITHM).prepare_key(_JWT_SECRET_KEY)
+
+@lru_cache(maxsize=1)
+def _get_jwt_verification_key():
+    """Key used to verify signatures: the HMAC secret, or the public half of an RS*/ES* key."""
+    key = _get_jwt_signing_key()
+    return key.public_key() if hasattr(key, "public_key") else key
 
 
 class JWTBearer(HTTPBearer):
-    """Custom JWT Bearer authentication."""
+    """
+    Custom JWT Bearer authentication.
+
+    Subclasses HTTPBearer only for the OpenAPI security scheme; the
+    Authorization header is parsed here directly instead of building an
+    HTTPAuthorizationCredentials and checking the scheme twice.
+    """
 
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
 
     async def __call__(self, request: Request) -> Optional[dict]:
-        credentials: HTTPAuthorizationCredentials = await super(JWTBearer, self).__call__(request)
-        if credentials:
-            if not credentials.scheme == "Bearer":
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Invalid authentication scheme."
-                )
-            payload = verify_jwt_token(credentials.credentials)
-            if not payload:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Invalid or expired token."
-                )
-            return payload
-        else:
+        authorization = request.headers.get("authorization")
+        if not authorization:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authenticated"
+            )
+        scheme, _, token = authorization.partition(" ")
+        if scheme != "Bearer" or not token:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Invalid authentication scheme."
+            )
+        payload = await verify_jwt_token(token)
+        if not payload:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Invalid authorization code."
+                detail="Invalid or expired token."
             )
+        return payload
+
+
+class _CachingGoogleRequest(google_requests.Request):
+    """
+    google-auth transport that caches successful GET responses for a while.
+
+    verify_oauth2_token downloads Google's signing certificates on every
+    call. Google publishes new keys well before signing with them, so an
+    hour-old copy still verifies fresh tokens, and most logins skip the
+    HTTPS round-trip entirely.
+    """
+
+    def __init__(self, session: requests.Session, ttl: int = 3600):
+        super().__init__(session=session)
+        self._responses: TTLCache = TTLCache(maxsize=8, ttl=ttl)
+        self._responses_lock = threading.Lock()
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=120, **kwargs):
+        if method != "GET" or body is not None:
+            return super().__call__(url, method, body, headers, timeout, **kwargs)
+
+        with self._responses_lock:
+            response = self._responses.get(url)
+        if response is None:
+            response = super().__call__(url, method, body, headers, timeout, **kwargs)
+            if response.status == 200:
+                with self._responses_lock:
+                    self._responses[url] = response
+        return response
+
+
+# Shared transport for Google ID token verification: one pooled session
+# instead of a new connection to googleapis.com for every login, and a
+# cached copy of the signing certificates.
+_google_request = _CachingGoogleRequest(session=requests.Session())
 
 
 def verify_google_token(token: str) -> dict:
@@ -131,7 +314,7 @@ def verify_google_token(token: str) -> dict:
     Raises:
         HTTPException: If token is invalid or email domain not allowed
     """
-    google_client_id = _get_google_client_id()
+    google_client_id = _settings.google_client_id
     if not google_client_id:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -142,7 +325,7 @@ def verify_google_token(token: str) -> dict:
         # Verify the token
         idinfo = id_token.verify_oauth2_token(
             token,
-            google_requests.Request(),
+            _google_request,
             google_client_id
         )
 
@@ -155,13 +338,12 @@ def verify_google_token(token: str) -> dict:
 
         # Verify email domain if configured
         email = idinfo.get('email', '')
-        allowed_domain = _get_allowed_email_domain()
-        if allowed_domain:
-            if not email.endswith(f"@{allowed_domain}"):
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Email domain not allowed. Must be @{allowed_domain}"
-                )
+        allowed_suffix = _settings.allowed_email_suffix
+        if allowed_suffix and not email.lower().endswith(allowed_suffix):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Email domain not allowed. Must be {allowed_suffix}"
+            )
 
         return {
             "email": email,
@@ -189,8 +371,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     Returns:
         Encoded JWT token string
     """
-    jwt_secret = _get_jwt_secret_key()
-    if not jwt_secret:
+    if not _JWT_SECRET_KEY:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="JWT not configured"
@@ -198,18 +379,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
     to_encode = data.copy()
 
+    # NumericDate claims as integer epoch seconds (RFC 7519)
+    now = int(time.time())
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=_get_jwt_expiration_minutes())
+        expire = now + _JWT_EXPIRATION_MINUTES * 60
 
     to_encode.update({
         "exp": expire,
-        "iat": datetime.utcnow(),
+        "iat": now,
+        "jti": uuid.uuid4().hex,
         "type": "access"
     })
+    if "sub" in to_encode:
+        token_blacklist.track(to_encode["jti"], expire, to_encode["sub"])
 
-    return jwt.encode(to_encode, jwt_secret, algorithm=_get_jwt_algorithm())
+    return _jwt_codec.encode(to_encode, _get_jwt_signing_key(), algorithm=_JWT_ALGORITHM)
 
 
 def create_refresh_token(data: dict) -> str:
@@ -222,8 +408,7 @@ def create_refresh_token(data: dict) -> str:
     Returns:
         Encoded JWT refresh token string
     """
-    jwt_secret = _get_jwt_secret_key()
-    if not jwt_secret:
+    if not _JWT_SECRET_KEY:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="JWT not configured"
@@ -231,18 +416,34 @@ def create_refresh_token(data: dict) -> str:
 
     to_encode = data.copy()
     # Refresh tokens last 7 days
-    expire = datetime.utcnow() + timedelta(days=7)
+    now = int(time.time())
+    expire = now + _MAX_TOKEN_LIFETIME_SECONDS
 
     to_encode.update({
         "exp": expire,
-        "iat": datetime.utcnow(),
+        "iat": now,
+        "jti": uuid.uuid4().hex,
         "type": "refresh"
     })
+    if "sub" in to_encode:
+        token_blacklist.track(to_encode["jti"], expire, to_encode["sub"])
+
+    return _jwt_codec.encode(to_encode, _get_jwt_signing_key(), algorithm=_JWT_ALGORITHM)
 
-    return jwt.encode(to_encode, jwt_secret, algorithm=_get_jwt_algorithm())
+
+async def _decode_jwt(token: str, **kwargs) -> dict:
+    """Verify and decode a token, off the event loop for asymmetric algorithms."""
+    if JWT_SIGNS_INLINE:
+        return _jwt_codec.decode(
+            token, _get_jwt_verification_key(), algorithms=[_JWT_ALGORITHM], **kwargs
+        )
+    return await asyncio.to_thread(
+        _jwt_codec.decode,
+        token, _get_jwt_verification_key(), algorithms=[_JWT_ALGORITHM], **kwargs
+    )
 
 
-def verify_jwt_token(token: str) -> Optional[dict]:
+async def verify_jwt_token(token: str) -> Optional[dict]:
     """
     Verify and decode a JWT token.
 
@@ -252,23 +453,29 @@ def verify_jwt_token(token: str) -> Optional[dict]:
     Returns:
         Decoded payload dict or None if invalid/blacklisted
     """
-    jwt_secret = _get_jwt_secret_key()
-    if not jwt_secret:
+    if not _JWT_SECRET_KEY:
         return None
 
-    # Check if token is blacklisted (revoked)
-    if token_blacklist.is_blacklisted(token):
+    cache_key = _token_cache_key(token)
+    payload = _verified_tokens.get(cache_key)
+    # Never serve a cached payload past the token's own expiry
+    if payload is None or payload.get("exp", 0) <= time.time():
+        try:
+            payload = await _decode_jwt(token)
+        except jwt.PyJWTError:
+            _verified_tokens.pop(cache_key, None)
+            return None
+        _verified_tokens[cache_key] = payload
+
+    # Check if token is blacklisted (revoked); needs the decoded jti
+    if await _is_revoked(_revocation_id(token, payload)):
         logger.debug("Token rejected: blacklisted")
         return None
 
-    try:
-        payload = jwt.decode(token, jwt_secret, algorithms=[_get_jwt_algorithm()])
-        return payload
-    except JWTError:
-        return None
+    return payload
 
 
-def blacklist_token(token: str) -> bool:
+async def blacklist_token(token: str) -> bool:
     """
     Add a token to the blacklist (revoke it).
 
@@ -279,24 +486,28 @@ def blacklist_token(token: str) -> bool:
         True if successfully blacklisted, False otherwise
     """
     try:
-        # Decode without verification to get expiry
-        # (we don't care if it's valid, just need expiry for cleanup)
-        payload = jwt.decode(
-            token,
-            _get_jwt_secret_key(),
-            algorithms=[_get_jwt_algorithm()],
-            options={"verify_exp": False}  # Allow expired tokens to be blacklisted
-        )
+        # Reuse the payload if this token was verified recently; otherwise
+        # decode it, ignoring expiry (we just need jti/exp for cleanup)
+        payload = _verified_tokens.pop(_token_cache_key(token), None)
+        if payload is None:
+            payload = await _decode_jwt(
+                token,
+                options={"verify_exp": False}  # Allow expired tokens to be blacklisted
+            )
+
+        # Expiration as epoch seconds, straight from the NumericDate claim
+        now = int(time.time())
+        # Default: blacklist for 7 days (max token lifetime)
+        expires_at = int(payload.get("exp") or now + _MAX_TOKEN_LIFETIME_SECONDS)
 
-        # Get expiration time from payload
-        exp_timestamp = payload.get("exp")
-        if exp_timestamp:
-            expires_at = datetime.fromtimestamp(exp_timestamp)
-        else:
-            # Default: blacklist for 7 days (max token lifetime)
-            expires_at = datetime.utcnow() + timedelta(days=7)
+        token_id = _revocation_id(token, payload)
+        token_blacklist.add(token_id, expires_at)
+        _not_revoked.pop(token_id, None)
 
-        token_blacklist.add(token, expires_at)
+        redis = get_redis()
+        ttl = expires_at - now
+        if redis is not None and ttl > 0:
+            await redis.set(_REVOKED_KEY_PREFIX + token_id, b"1", ex=ttl)
         logger.info(f"Token blacklisted for user: {payload.get('sub', 'unknown')}")
         return True
 
@@ -305,7 +516,71 @@ def blacklist_token(token: str) -> bool:
         return False
 
 
-def get_current_user(token: str) -> dict:
+async def publish_user_tokens(user_email: str) -> None:
+    """
+    Add the user's tracked token IDs to their Redis set (no-op without Redis).
+
+    Call after issuing tokens, so any worker can revoke them through
+    revoke_user_tokens. The set expires with the longest-lived token.
+    """
+    redis = get_redis()
+    token_ids = token_blacklist.tokens_for_user(user_email)
+    if redis is None or not token_ids:
+        return
+
+    key = _USER_TOKENS_KEY_PREFIX + user_email
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(key, *token_ids)
+            pipe.expire(key, _MAX_TOKEN_LIFETIME_SECONDS)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Failed to index tokens in Redis: {e}")
+
+
+async def revoke_user_tokens(user_email: str) -> int:
+    """
+    Revoke every token issued to a user.
+
+    Only that user's index entries are read: the local user -> tokens map,
+    plus (with Redis) the user's set, whose members are revoked in one
+    pipelined round-trip.
+
+    Args:
+        user_email: Email (token subject) of the user
+
+    Returns:
+        Number of tokens revoked
+    """
+    revoked = token_blacklist.revoke_all_for_user(user_email)
+    token_ids = set(revoked)
+
+    redis = get_redis()
+    if redis is not None:
+        key = _USER_TOKENS_KEY_PREFIX + user_email
+        try:
+            members = await redis.smembers(key)
+            token_ids.update(m.decode() for m in members)
+            now = int(time.time())
+            async with redis.pipeline(transaction=False) as pipe:
+                for token_id in token_ids:
+                    # Expiry is only known for locally issued tokens; the
+                    # others are kept for the longest token lifetime
+                    ttl = revoked.get(token_id, now + _MAX_TOKEN_LIFETIME_SECONDS) - now
+                    if ttl > 0:
+                        pipe.set(_REVOKED_KEY_PREFIX + token_id, b"1", ex=ttl)
+                pipe.delete(key)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Failed to revoke user tokens in Redis: {e}")
+
+    for token_id in token_ids:
+        _not_revoked.pop(token_id, None)
+    logger.info(f"Revoked {len(token_ids)} tokens for user: {user_email}")
+    return len(token_ids)
+
+
+async def get_current_user(token: str) -> dict:
     """
     Get the current user from a JWT token.
 
@@ -318,7 +593,7 @@ def get_current_user(token: str) -> dict:
     Raises:
         HTTPException: If token is invalid
     """
-    payload = verify_jwt_token(token)
+    payload = await verify_jwt_token(token)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
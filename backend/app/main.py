@@ -1,13 +1,21 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from collections import defaultdict
-from datetime import datetime, timedelta
+from fastapi.responses import ORJSONResponse
+from typing import Dict, List, Tuple
 import asyncio
+import importlib
 import logging
 
-from app.api import ecommerce, shortage, pharmacies, auth, ukie
 from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.http_clients import open_http_clients, close_http_clients
+from app.core.redis_client import connect_to_redis, close_redis_connection
+from app.core.security import run_blacklist_cleanup
+from app.core.middleware import (
+    ETagMiddleware,
+    RateLimiter,
+    RateLimitMiddleware,
+    SecurityHeadersMiddleware,
+)
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -22,35 +30,11 @@ app = FastAPI(
     version="2.0.0",
     # Disable docs in production for security
     docs_url=None if settings.environment == "production" else "/docs",
-    redoc_url=None if settings.environment == "production" else "/redoc"
+    redoc_url=None if settings.environment == "production" else "/redoc",
+    default_response_class=ORJSONResponse
 )
 
-# =============================================================================
-# Rate Limiting (in-memory, simple implementation)
-# =============================================================================
-class RateLimiter:
-    def __init__(self, requests_per_minute: int = 60):
-        self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)
-        self._lock = asyncio.Lock()
-
-    async def is_allowed(self, client_ip: str) -> bool:
-        async with self._lock:
-            now = datetime.now()
-            minute_ago = now - timedelta(minutes=1)
-
-            # Clean old requests
-            self.requests[client_ip] = [
-                req_time for req_time in self.requests[client_ip]
-                if req_time > minute_ago
-            ]
-
-            if len(self.requests[client_ip]) >= self.requests_per_minute:
-                return False
-
-            self.requests[client_ip].append(now)
-            return True
-
+# Shared by all requests of this worker (counters move to Redis when configured)
 rate_limiter = RateLimiter(requests_per_minute=100)
 
 # =============================================================================
@@ -63,23 +47,30 @@ async def global_exception_handler(request: Request, exc: Exception):
 
     # Return generic error in production, detailed in development
     if settings.environment == "production":
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"detail": "Internal server error"}
         )
     else:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"detail": str(exc), "type": type(exc).__name__}
         )
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
 
+# ETag / 304 handling for polled read-only endpoints. Registered before CORS so
+# it runs innermost and 304 responses still get CORS and security headers.
+app.add_middleware(
+    ETagMiddleware,
+    path_prefixes=("/api/ecommerce", "/api/pharmacies"),
+)
+
 # CORS configuration - Use settings from environment
 app.add_middleware(
     CORSMiddleware,
@@ -91,48 +82,31 @@ app.add_middleware(
 
 
 # =============================================================================
-# Rate Limiting Middleware
+# Rate Limiting / Security Headers Middleware
 # =============================================================================
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    # Get client IP (consider X-Forwarded-For for proxied requests)
-    forwarded = request.headers.get("X-Forwarded-For")
-    client_ip = forwarded.split(",")[0].strip() if forwarded else request.client.host
-
-    # Skip rate limiting for health checks
-    if request.url.path in ["/health", "/"]:
-        return await call_next(request)
-
-    if not await rate_limiter.is_allowed(client_ip):
-        logger.warning(f"Rate limit exceeded for IP: {client_ip}")
-        return JSONResponse(
-            status_code=429,
-            content={"detail": "Too many requests. Please try again later."}
-        )
-
-    return await call_next(request)
+# Encoded once; production adds HSTS and a CSP (restrictive since the API
+# doesn't serve HTML)
+_SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+if settings.environment == "production":
+    _SECURITY_HEADERS += [
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains; preload"),
+        (b"content-security-policy", b"default-src 'none'; frame-ancestors 'none'"),
+    ]
 
-# =============================================================================
-# Security Headers Middleware
-# =============================================================================
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    response = await call_next(request)
-
-    # Basic security headers
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-
-    # Production-only headers
-    if settings.environment == "production":
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
-        # CSP for API (restrictive since it's not serving HTML)
-        response.headers["Content-Security-Policy"] = "default-src 'none'; frame-ancestors 'none'"
 
-    return response
+app.add_middleware(
+    RateLimitMiddleware,
+    limiter=rate_limiter,
+    exempt_paths=("/health", "/"),
+)
+# Added last so it runs outermost and 429s get the headers too
+app.add_middleware(SecurityHeadersMiddleware, headers=_SECURITY_HEADERS)
 
 # Event handlers
 @app.on_event("startup")
@@ -165,32 +139,49 @@ async def shutdown_db_client():
     except Exception:
         pass
 
-# Include routers
-app.include_router(
-    ecommerce.router, 
-    prefix="/api/ecommerce", 
-    tags=["Ecommerce"]
-)
-app.include_router(
-    shortage.router, 
-    prefix="/api/shortage", 
-    tags=["Shortage"]
-)
-app.include_router(
-    pharmacies.router,
-    prefix="/api/pharmacies",
-    tags=["Pharmacies"]
-)
-app.include_router(
-    auth.router,
-    prefix="/api",
-    tags=["Authentication"]
-)
-app.include_router(
-    ukie.router,
-    prefix="/api/ukie",
-    tags=["Ukie"]
-)
+@app.on_event("startup")
+async def startup_http_clients():
+    await open_http_clients()
+
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    await close_http_clients()
+
+@app.on_event("startup")
+async def startup_redis_client():
+    await connect_to_redis()
+
+@app.on_event("shutdown")
+async def shutdown_redis_client():
+    await close_redis_connection()
+
+@app.on_event("startup")
+async def startup_blacklist_cleanup():
+    # Expired blacklist entries are purged here instead of on every lookup
+    app.state.blacklist_cleanup = asyncio.create_task(run_blacklist_cleanup())
+
+@app.on_event("shutdown")
+async def shutdown_blacklist_cleanup():
+    app.state.blacklist_cleanup.cancel()
+
+# Routers by app.api module name: (prefix, tags)
+_ROUTERS: Dict[str, Tuple[str, List[str]]] = {
+    "ecommerce": ("/api/ecommerce", ["Ecommerce"]),
+    "shortage": ("/api/shortage", ["Shortage"]),
+    "pharmacies": ("/api/pharmacies", ["Pharmacies"]),
+    "auth": ("/api", ["Authentication"]),
+    "ukie": ("/api/ukie", ["Ukie"]),
+}
+
+# Include routers - only enabled modules are imported, so a trimmed
+# deployment doesn't pay their import time or memory
+for module_name in settings.enabled_modules:
+    if module_name not in _ROUTERS:
+        logger.warning(f"Unknown API module in ENABLED_MODULES: {module_name}")
+        continue
+    prefix, tags = _ROUTERS[module_name]
+    module = importlib.import_module(f"app.api.{module_name}")
+    app.include_router(module.router, prefix=prefix, tags=tags)
 
 @app.get("/")
 async def root():
@@ -1,55 +1,214 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorDatabase
+import hashlib
+from cachetools import TTLCache
+import orjson
+from pymongo.asynchronous.database import AsyncDatabase
 
+from app.core.cache import cached, shared_cache_ttl, shared_cached
 from app.core.config import get_settings
+from app.core.database import PARTNER_COLLATION
+
+# Ecommerce metrics when no booking matched
+_EMPTY_ECOMMERCE_METRICS: Dict[str, Any] = {
+    "gross_bookings": 0,
+    "cancelled_bookings": 0,
+    "net_bookings": 0,
+    "gross_gmv": 0.0,
+    "cancelled_gmv": 0.0,
+    "net_gmv": 0.0,
+    "pharmacies_with_orders": 0
+}
+
+# GMV of a booking: SUM(items[].pvp * items[].quantity).
+# $map + array $sum rather than $reduce: the sum is a single native pass
+# instead of evaluating an $add expression per item.
+_GMV_EXPRESSION: Dict[str, Any] = {
+    "$sum": {
+        "$map": {
+            "input": "$items",
+            "in": {
+                "$multiply": [
+                    {"$toDouble": {"$ifNull": ["$$this.pvp", 0]}},
+                    {"$toInt": {"$ifNull": ["$$this.quantity", 0]}}
+                ]
+            }
+        }
+    }
+}
+
+# Date grouping (_id fields) and sort order per time series group_by.
+# Built once; pipelines embed them as-is since they're never mutated.
+# $isoWeekYear keeps Dec 29-31 with their ISO week's year.
+_TIME_GROUPINGS: Dict[str, Tuple[Dict[str, Any], Dict[str, int]]] = {
+    "week": (
+        {"year": {"$isoWeekYear": "$createdDate"}, "week": {"$isoWeek": "$createdDate"}},
+        {"_id.year": 1, "_id.week": 1}
+    ),
+    "month": (
+        {"year": {"$year": "$createdDate"}, "month": {"$month": "$createdDate"}},
+        {"_id.year": 1, "_id.month": 1}
+    ),
+    "quarter": (
+        {
+            "year": {"$year": "$createdDate"},
+            "quarter": {"$ceil": {"$divide": [{"$month": "$createdDate"}, 3]}}
+        },
+        {"_id.year": 1, "_id.quarter": 1}
+    ),
+    "year": (
+        {"year": {"$year": "$createdDate"}},
+        {"_id.year": 1}
+    )
+}
+
+# All-time distinct pharmacy counts by (database, partners). They only grow
+# when a pharmacy gets its first order, so they're refreshed like closed periods.
+_all_time_pharmacy_totals: TTLCache = TTLCache(
+    maxsize=64, ttl=get_settings().closed_period_cache_ttl_seconds
+)
 
 
 class BookingRepository:
     """
     Repository for accessing bookings collection.
     Handles both Ecommerce (thirdUser) and Shortage (origin) queries.
+
+    GMV amounts and averages come back unrounded; the services round
+    them with round(v, 2) when building the response models.
     """
     
-    def __init__(self, database: AsyncIOMotorDatabase):
+    def __init__(self, database: AsyncDatabase):
         self._db = database
         self._collection = database["bookings"]
         self._settings = get_settings()
+        # Cancelled-booking test shared by every pipeline's accumulators
+        self._is_cancelled = {"$eq": ["$state", self._settings.cancelled_state_id]}
+    
+    async def _aggregate(
+        self,
+        pipeline: List[Dict[str, Any]],
+        length: int,
+        end_date: Optional[datetime],
+        collation: Optional[Dict[str, Any]] = None,
+        ttl: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run an aggregation, sharing results across workers through Redis.
+
+        The key hashes the database name and the full pipeline, so any change
+        in dates, partners or grouping is a different entry. Results for
+        periods that are already closed are kept longer (see shared_cache_ttl)
+        unless an explicit ttl is given.
+        """
+        digest = hashlib.blake2b(
+            orjson.dumps([self._db.name, pipeline, length, collation]),
+            digest_size=16
+        ).hexdigest()
+
+        async def run() -> List[Dict[str, Any]]:
+            # Results are small and capped at length: ask for all of them in
+            # the first batch (default 101) so a 500-row series needs no getMore
+            cursor = await self._collection.aggregate(
+                pipeline, collation=collation, batchSize=length
+            )
+            return await cursor.to_list(length=length)
+
+        return await shared_cached(
+            f"agg:bookings:{digest}", ttl or shared_cache_ttl(end_date), run
+        )
     
-    def _round_to_2_decimals(self, value: Any) -> Dict[str, Any]:
+    def _booking_fields(self, *fields: str, **computed: Any) -> Dict[str, Any]:
         """
-        Round a value to 2 decimal places.
-        Compatible with MongoDB < 4.2 (uses $trunc instead of $round).
+        $project stage run right after $match: computes GMV and keeps only
+        state plus the given fields, so later stages handle small documents
+        instead of full bookings (items and all).
         """
         return {
-            "$divide": [
-                {"$trunc": {"$add": [{"$multiply": [value, 100]}, 0.5]}},
-                100
-            ]
+            "$project": {
+                "_id": 0,
+                "state": 1,
+                **dict.fromkeys(fields, 1),
+                "gmv": _GMV_EXPRESSION,
+                **computed
+            }
         }
     
-    def _gmv_calculation(self) -> Dict[str, Any]:
+    def _per_pharmacy_group(self, group_id: Any) -> List[Dict[str, Any]]:
         """
-        GMV calculation pipeline stage.
-        GMV = SUM(items[].pvp * items[].quantity)
+        Booking/GMV totals per group plus its count of distinct pharmacies.
+
+        Groups by (group, target) first and then counts those rows per group,
+        so no stage has to hold every pharmacy id of a group in one array
+        (which $addToSet + $size would).
+        Bookings without a target don't count as a pharmacy.
         """
-        return {
-            "$reduce": {
-                "input": "$items",
-                "initialValue": 0,
-                "in": {
-                    "$add": [
-                        "$$value",
-                        {
-                            "$multiply": [
-                                {"$toDouble": {"$ifNull": ["$$this.pvp", 0]}},
-                                {"$toInt": {"$ifNull": ["$$this.quantity", 0]}}
-                            ]
-                        }
-                    ]
+        return [
+            {
+                "$group": {
+                    "_id": {"group": group_id, "target": "$target"},
+                    "gross_bookings": {"$sum": 1},
+                    "cancelled_bookings": {
+                        "$sum": {"$cond": [self._is_cancelled, 1, 0]}
+                    },
+                    "gross_gmv": {"$sum": "$gmv"},
+                    "cancelled_gmv": {
+                        "$sum": {"$cond": [self._is_cancelled, "$gmv", 0]}
+                    }
+                }
+            },
+            {
+                "$group": {
+                    "_id": "$_id.group",
+                    "gross_bookings": {"$sum": "$gross_bookings"},
+                    "cancelled_bookings": {"$sum": "$cancelled_bookings"},
+                    "gross_gmv": {"$sum": "$gross_gmv"},
+                    "cancelled_gmv": {"$sum": "$cancelled_gmv"},
+                    "pharmacies_with_orders": {
+                        "$sum": {"$cond": [{"$gt": ["$_id.target", None]}, 1, 0]}
+                    }
                 }
             }
-        }
+        ]
+    
+    def _partner_metrics_stages(self) -> List[Dict[str, Any]]:
+        """Per-partner grouping (on partner_lower) and final metrics, by net GMV."""
+        return [
+            *self._per_pharmacy_group("$partner_lower"),
+            {
+                "$project": {
+                    "partner": "$_id",
+                    "gross_bookings": 1,
+                    "cancelled_bookings": 1,
+                    "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
+                    "gross_gmv": 1,
+                    "cancelled_gmv": 1,
+                    "net_gmv": {"$subtract": ["$gross_gmv", "$cancelled_gmv"]},
+                    "pharmacies_with_orders": 1
+                }
+            },
+            {"$sort": {"net_gmv": -1}},
+            # Same cap as the per-partner result list
+            {"$limit": 100}
+        ]
+    
+    def _totals_stages(self) -> List[Dict[str, Any]]:
+        """Single-group totals and final metrics."""
+        return [
+            *self._per_pharmacy_group(None),
+            {
+                "$project": {
+                    "_id": 0,
+                    "gross_bookings": 1,
+                    "cancelled_bookings": 1,
+                    "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
+                    "gross_gmv": 1,
+                    "cancelled_gmv": 1,
+                    "net_gmv": {"$subtract": ["$gross_gmv", "$cancelled_gmv"]},
+                    "pharmacies_with_orders": 1
+                }
+            }
+        ]
     
     async def get_ecommerce_metrics_by_partner(
         self,
@@ -61,39 +220,19 @@ class BookingRepository:
         Get ecommerce metrics for a specific partner.
         Ecommerce = bookings with thirdUser.user and WITHOUT origin.
         """
-        cancelled_state = self._settings.cancelled_state_id
-        
         pipeline = [
             # Match ecommerce bookings for this partner in date range
             {
                 "$match": {
-                    "thirdUser.user": {"$regex": f"^{partner}$", "$options": "i"},
+                    "thirdUser.user": partner,
                     "origin": {"$exists": False},
                     "createdDate": {"$gte": start_date, "$lte": end_date}
                 }
             },
-            # Add computed fields
-            {
-                "$addFields": {
-                    "gmv": self._gmv_calculation(),
-                    "is_cancelled": {"$eq": ["$state", cancelled_state]}
-                }
-            },
+            # Only the fields the group stage reads, plus GMV
+            self._booking_fields("target"),
             # Group to calculate metrics
-            {
-                "$group": {
-                    "_id": None,
-                    "gross_bookings": {"$sum": 1},
-                    "cancelled_bookings": {
-                        "$sum": {"$cond": ["$is_cancelled", 1, 0]}
-                    },
-                    "gross_gmv": {"$sum": "$gmv"},
-                    "cancelled_gmv": {
-                        "$sum": {"$cond": ["$is_cancelled", "$gmv", 0]}
-                    },
-                    "unique_pharmacies": {"$addToSet": "$target"}
-                }
-            },
+            *self._per_pharmacy_group(None),
             # Project final metrics
             {
                 "$project": {
@@ -101,46 +240,34 @@ class BookingRepository:
                     "gross_bookings": 1,
                     "cancelled_bookings": 1,
                     "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
-                    "gross_gmv": self._round_to_2_decimals("$gross_gmv"),
-                    "cancelled_gmv": self._round_to_2_decimals("$cancelled_gmv"),
-                    "net_gmv": self._round_to_2_decimals({"$subtract": ["$gross_gmv", "$cancelled_gmv"]}),
-                    "pharmacies_with_orders": {"$size": "$unique_pharmacies"}
+                    "gross_gmv": 1,
+                    "cancelled_gmv": 1,
+                    "net_gmv": {"$subtract": ["$gross_gmv", "$cancelled_gmv"]},
+                    "pharmacies_with_orders": 1
                 }
             }
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        results = await cursor.to_list(length=1)
+        results = await self._aggregate(pipeline, 1, end_date, collation=PARTNER_COLLATION)
         
         if results:
             return results[0]
         
-        return {
-            "gross_bookings": 0,
-            "cancelled_bookings": 0,
-            "net_bookings": 0,
-            "gross_gmv": 0.0,
-            "cancelled_gmv": 0.0,
-            "net_gmv": 0.0,
-            "pharmacies_with_orders": 0
-        }
+        return dict(_EMPTY_ECOMMERCE_METRICS)
     
     async def get_all_ecommerce_metrics(
         self,
         start_date: datetime,
-        end_date: datetime
+        end_date: datetime,
+        partners: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Get ecommerce metrics for allowed partners only.
-        Uses partner list from config settings.
+        Get ecommerce metrics per partner, in a single pipeline.
+        Uses partner list from config settings unless partners is given;
+        prefer this over calling get_ecommerce_metrics_by_partner per partner.
         """
-        cancelled_state = self._settings.cancelled_state_id
-        
-        # Build partner regex conditions for allowed partners only
-        partner_conditions = [
-            {"thirdUser.user": {"$regex": f"^{p}$", "$options": "i"}}
-            for p in self._settings.partners
-        ]
+        # Use provided partners or default to allowed partners from config
+        allowed_partners = partners if partners else self._settings.partners
         
         pipeline = [
             # Match only allowed partners in date range
@@ -148,50 +275,16 @@ class BookingRepository:
                 "$match": {
                     "origin": {"$exists": False},
                     "createdDate": {"$gte": start_date, "$lte": end_date},
-                    "$or": partner_conditions
-                }
-            },
-            # Add computed fields
-            {
-                "$addFields": {
-                    "gmv": self._gmv_calculation(),
-                    "is_cancelled": {"$eq": ["$state", cancelled_state]},
-                    "partner_lower": {"$toLower": "$thirdUser.user"}
-                }
-            },
-            # Group by partner
-            {
-                "$group": {
-                    "_id": "$partner_lower",
-                    "gross_bookings": {"$sum": 1},
-                    "cancelled_bookings": {
-                        "$sum": {"$cond": ["$is_cancelled", 1, 0]}
-                    },
-                    "gross_gmv": {"$sum": "$gmv"},
-                    "cancelled_gmv": {
-                        "$sum": {"$cond": ["$is_cancelled", "$gmv", 0]}
-                    },
-                    "unique_pharmacies": {"$addToSet": "$target"}
+                    "thirdUser.user": {"$in": allowed_partners}
                 }
             },
-            # Project final metrics
-            {
-                "$project": {
-                    "partner": "$_id",
-                    "gross_bookings": 1,
-                    "cancelled_bookings": 1,
-                    "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
-                    "gross_gmv": self._round_to_2_decimals("$gross_gmv"),
-                    "cancelled_gmv": self._round_to_2_decimals("$cancelled_gmv"),
-                    "net_gmv": self._round_to_2_decimals({"$subtract": ["$gross_gmv", "$cancelled_gmv"]}),
-                    "pharmacies_with_orders": {"$size": "$unique_pharmacies"}
-                }
-            },
-            {"$sort": {"net_gmv": -1}}
+            # Only the fields the group stage reads, plus GMV
+            self._booking_fields("target", partner_lower={"$toLower": "$thirdUser.user"}),
+            # Group by partner and project final metrics
+            *self._partner_metrics_stages()
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        return await cursor.to_list(length=100)
+        return await self._aggregate(pipeline, 100, end_date, collation=PARTNER_COLLATION)
     
     async def get_shortage_metrics(
         self,
@@ -202,8 +295,6 @@ class BookingRepository:
         Get shortage metrics (global, no partner filter).
         Shortage = bookings WITH origin field.
         """
-        cancelled_state = self._settings.cancelled_state_id
-        
         pipeline = [
             # Match shortage bookings in date range
             {
@@ -212,24 +303,19 @@ class BookingRepository:
                     "createdDate": {"$gte": start_date, "$lte": end_date}
                 }
             },
-            # Add computed fields
-            {
-                "$addFields": {
-                    "gmv": self._gmv_calculation(),
-                    "is_cancelled": {"$eq": ["$state", cancelled_state]}
-                }
-            },
+            # Only the fields the group stage reads, plus GMV
+            self._booking_fields("origin", "target"),
             # Group to calculate metrics
             {
                 "$group": {
                     "_id": None,
                     "gross_bookings": {"$sum": 1},
                     "cancelled_bookings": {
-                        "$sum": {"$cond": ["$is_cancelled", 1, 0]}
+                        "$sum": {"$cond": [self._is_cancelled, 1, 0]}
                     },
                     "gross_gmv": {"$sum": "$gmv"},
                     "cancelled_gmv": {
-                        "$sum": {"$cond": ["$is_cancelled", "$gmv", 0]}
+                        "$sum": {"$cond": [self._is_cancelled, "$gmv", 0]}
                     },
                     "unique_origins": {"$addToSet": "$origin"},
                     "unique_targets": {"$addToSet": "$target"}
@@ -242,17 +328,16 @@ class BookingRepository:
                     "gross_bookings": 1,
                     "cancelled_bookings": 1,
                     "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
-                    "gross_gmv": self._round_to_2_decimals("$gross_gmv"),
-                    "cancelled_gmv": self._round_to_2_decimals("$cancelled_gmv"),
-                    "net_gmv": self._round_to_2_decimals({"$subtract": ["$gross_gmv", "$cancelled_gmv"]}),
+                    "gross_gmv": 1,
+                    "cancelled_gmv": 1,
+                    "net_gmv": {"$subtract": ["$gross_gmv", "$cancelled_gmv"]},
                     "sending_pharmacies": {"$size": "$unique_origins"},
                     "receiving_pharmacies": {"$size": "$unique_targets"}
                 }
             }
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        results = await cursor.to_list(length=1)
+        results = await self._aggregate(pipeline, 1, end_date)
         
         if results:
             return results[0]
@@ -278,77 +363,29 @@ class BookingRepository:
         """
         Get ecommerce metrics grouped by time period.
         group_by: 'week', 'month', 'quarter', 'year'
+
+        Assumes a bounded period: the date range is matched first and at most
+        100 buckets are returned (about two years of weeks).
         """
-        cancelled_state = self._settings.cancelled_state_id
-        
-        # Define date grouping based on group_by parameter
-        if group_by == "week":
-            # Use $isoWeekYear to correctly handle year boundaries for ISO weeks
-            # This ensures Dec 29-31 are grouped with their correct ISO week year
-            date_group = {
-                "year": {"$isoWeekYear": "$createdDate"},
-                "week": {"$isoWeek": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1, "_id.week": 1}
-        elif group_by == "quarter":
-            date_group = {
-                "year": {"$year": "$createdDate"},
-                "quarter": {
-                    "$ceil": {"$divide": [{"$month": "$createdDate"}, 3]}
-                }
-            }
-            sort_fields = {"_id.year": 1, "_id.quarter": 1}
-        elif group_by == "year":
-            date_group = {
-                "year": {"$year": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1}
-        else:  # month (default)
-            date_group = {
-                "year": {"$year": "$createdDate"},
-                "month": {"$month": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1, "_id.month": 1}
+        date_group, sort_fields = _TIME_GROUPINGS.get(group_by, _TIME_GROUPINGS["month"])
         
         # Use provided partners or default to allowed partners from config
         allowed_partners = partners if partners else self._settings.partners
         
-        # Build partner regex conditions - always filter by allowed partners
-        partner_conditions = [
-            {"thirdUser.user": {"$regex": f"^{p}$", "$options": "i"}} 
-            for p in allowed_partners
-        ]
-        
         # Build match stage with partner filter
         match_stage: Dict[str, Any] = {
             "origin": {"$exists": False},
             "createdDate": {"$gte": start_date, "$lte": end_date},
-            "$or": partner_conditions
+            "thirdUser.user": {"$in": allowed_partners}
         }
         
         pipeline = [
             {"$match": match_stage},
-            {
-                "$addFields": {
-                    "gmv": self._gmv_calculation(),
-                    "is_cancelled": {"$eq": ["$state", cancelled_state]}
-                }
-            },
-            {
-                "$group": {
-                    "_id": date_group,
-                    "gross_bookings": {"$sum": 1},
-                    "cancelled_bookings": {
-                        "$sum": {"$cond": ["$is_cancelled", 1, 0]}
-                    },
-                    "gross_gmv": {"$sum": "$gmv"},
-                    "cancelled_gmv": {
-                        "$sum": {"$cond": ["$is_cancelled", "$gmv", 0]}
-                    },
-                    "unique_pharmacies": {"$addToSet": "$target"}
-                }
-            },
+            self._booking_fields("target", "createdDate"),
+            *self._per_pharmacy_group(date_group),
             {"$sort": sort_fields},
+            # Same cap as to_list() below, applied server-side after the sort
+            {"$limit": 100},
             {
                 "$project": {
                     "_id": 0,
@@ -356,43 +393,43 @@ class BookingRepository:
                     "gross_bookings": 1,
                     "cancelled_bookings": 1,
                     "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
-                    "gross_gmv": self._round_to_2_decimals("$gross_gmv"),
-                    "cancelled_gmv": self._round_to_2_decimals("$cancelled_gmv"),
-                    "net_gmv": self._round_to_2_decimals({"$subtract": ["$gross_gmv", "$cancelled_gmv"]}),
-                    "pharmacies_with_orders": {"$size": "$unique_pharmacies"},
+                    "gross_gmv": 1,
+                    "cancelled_gmv": 1,
+                    "net_gmv": {"$subtract": ["$gross_gmv", "$cancelled_gmv"]},
+                    "pharmacies_with_orders": 1,
                     "average_ticket": {
                         "$cond": [
                             {"$gt": [{"$subtract": ["$gross_bookings", "$cancelled_bookings"]}, 0]},
-                            self._round_to_2_decimals({
+                            {
                                 "$divide": [
                                     {"$subtract": ["$gross_gmv", "$cancelled_gmv"]},
                                     {"$subtract": ["$gross_bookings", "$cancelled_bookings"]}
                                 ]
-                            }),
+                            },
                             0
                         ]
                     },
                     "avg_orders_per_pharmacy": {
                         "$cond": [
-                            {"$gt": [{"$size": "$unique_pharmacies"}, 0]},
-                            self._round_to_2_decimals({
+                            {"$gt": ["$pharmacies_with_orders", 0]},
+                            {
                                 "$divide": [
                                     {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
-                                    {"$size": "$unique_pharmacies"}
+                                    "$pharmacies_with_orders"
                                 ]
-                            }),
+                            },
                             0
                         ]
                     },
                     "avg_gmv_per_pharmacy": {
                         "$cond": [
-                            {"$gt": [{"$size": "$unique_pharmacies"}, 0]},
-                            self._round_to_2_decimals({
+                            {"$gt": ["$pharmacies_with_orders", 0]},
+                            {
                                 "$divide": [
                                     {"$subtract": ["$gross_gmv", "$cancelled_gmv"]},
-                                    {"$size": "$unique_pharmacies"}
+                                    "$pharmacies_with_orders"
                                 ]
-                            }),
+                            },
                             0
                         ]
                     }
@@ -400,8 +437,7 @@ class BookingRepository:
             }
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        return await cursor.to_list(length=100)
+        return await self._aggregate(pipeline, 100, end_date, collation=PARTNER_COLLATION)
 
     async def get_ecommerce_totals(
         self,
@@ -412,74 +448,68 @@ class BookingRepository:
         """
         Get total ecommerce metrics. Filters by allowed partners from config by default.
         """
-        cancelled_state = self._settings.cancelled_state_id
-        
         # Use provided partners or default to allowed partners from config
         allowed_partners = partners if partners else self._settings.partners
         
-        # Build partner regex conditions
-        partner_conditions = [
-            {"thirdUser.user": {"$regex": f"^{p}$", "$options": "i"}}
-            for p in allowed_partners
-        ]
-        
         pipeline = [
             {
                 "$match": {
-                    "thirdUser.user": {"$exists": True},
+                    "thirdUser.user": {"$in": allowed_partners},
                     "origin": {"$exists": False},
-                    "createdDate": {"$gte": start_date, "$lte": end_date},
-                    "$or": partner_conditions
-                }
-            },
-            {
-                "$addFields": {
-                    "gmv": self._gmv_calculation(),
-                    "is_cancelled": {"$eq": ["$state", cancelled_state]}
+                    "createdDate": {"$gte": start_date, "$lte": end_date}
                 }
             },
+            self._booking_fields("target"),
+            *self._totals_stages()
+        ]
+        
+        results = await self._aggregate(pipeline, 1, end_date, collation=PARTNER_COLLATION)
+        
+        if results:
+            return results[0]
+        
+        return dict(_EMPTY_ECOMMERCE_METRICS)
+
+    async def get_ecommerce_summary(
+        self,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Any]:
+        """
+        Per-partner metrics and totals for allowed partners, in one pipeline.
+
+        Same results as get_all_ecommerce_metrics plus get_ecommerce_totals,
+        but the date range is matched and GMV computed once, then a $facet
+        fans out to both groupings.
+
+        Returns:
+            {"partners": [...], "totals": {...}}; totals.pharmacies_with_orders
+            is the distinct count of pharmacies with orders in the period.
+        """
+        pipeline = [
             {
-                "$group": {
-                    "_id": None,
-                    "gross_bookings": {"$sum": 1},
-                    "cancelled_bookings": {
-                        "$sum": {"$cond": ["$is_cancelled", 1, 0]}
-                    },
-                    "gross_gmv": {"$sum": "$gmv"},
-                    "cancelled_gmv": {
-                        "$sum": {"$cond": ["$is_cancelled", "$gmv", 0]}
-                    },
-                    "unique_pharmacies": {"$addToSet": "$target"}
+                "$match": {
+                    "thirdUser.user": {"$in": self._settings.partners},
+                    "origin": {"$exists": False},
+                    "createdDate": {"$gte": start_date, "$lte": end_date}
                 }
             },
+            self._booking_fields("target", partner_lower={"$toLower": "$thirdUser.user"}),
             {
-                "$project": {
-                    "_id": 0,
-                    "gross_bookings": 1,
-                    "cancelled_bookings": 1,
-                    "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
-                    "gross_gmv": self._round_to_2_decimals("$gross_gmv"),
-                    "cancelled_gmv": self._round_to_2_decimals("$cancelled_gmv"),
-                    "net_gmv": self._round_to_2_decimals({"$subtract": ["$gross_gmv", "$cancelled_gmv"]}),
-                    "pharmacies_with_orders": {"$size": "$unique_pharmacies"}
+                "$facet": {
+                    "partners": self._partner_metrics_stages(),
+                    "totals": self._totals_stages()
                 }
             }
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        results = await cursor.to_list(length=1)
-        
-        if results:
-            return results[0]
+        results = await self._aggregate(pipeline, 1, end_date, collation=PARTNER_COLLATION)
+        facets = results[0] if results else {}
+        totals = facets.get("totals")
         
         return {
-            "gross_bookings": 0,
-            "cancelled_bookings": 0,
-            "net_bookings": 0,
-            "gross_gmv": 0.0,
-            "cancelled_gmv": 0.0,
-            "net_gmv": 0.0,
-            "pharmacies_with_orders": 0
+            "partners": facets.get("partners", []),
+            "totals": totals[0] if totals else dict(_EMPTY_ECOMMERCE_METRICS)
         }
 
     async def get_total_pharmacies(
@@ -492,24 +522,24 @@ class BookingRepository:
         Get total unique pharmacies that have received ecommerce orders.
         Uses allowed partners from config by default.
         If dates are provided, only count pharmacies with orders in that period.
+
+        The all-time count (no dates) covers every ecommerce booking of those
+        partners. It runs on the partner_origin_target index and is kept
+        in-process (and in Redis, when configured) for
+        CLOSED_PERIOD_CACHE_TTL_SECONDS rather than recounted per request.
         """
         # Use provided partners or default to allowed partners from config
         allowed_partners = partners if partners else self._settings.partners
         
-        # Build partner regex conditions
-        partner_conditions = [
-            {"thirdUser.user": {"$regex": f"^{p}$", "$options": "i"}}
-            for p in allowed_partners
-        ]
-        
         match_stage: Dict[str, Any] = {
             "origin": {"$exists": False},
             "target": {"$exists": True},
-            "$or": partner_conditions
+            "thirdUser.user": {"$in": allowed_partners}
         }
         
         # Add date filter if provided
-        if start_date and end_date:
+        dated = bool(start_date and end_date)
+        if dated:
             match_stage["createdDate"] = {
                 "$gte": start_date,
                 "$lte": end_date
@@ -521,12 +551,23 @@ class BookingRepository:
             {"$count": "total"}
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        results = await cursor.to_list(length=1)
-        
-        if results:
-            return results[0].get("total", 0)
-        return 0
+        async def count(ttl: Optional[int] = None) -> int:
+            results = await self._aggregate(
+                pipeline, 1, end_date, collation=PARTNER_COLLATION, ttl=ttl
+            )
+            if results:
+                return results[0].get("total", 0)
+            return 0
+        
+        if dated:
+            return await count()
+        
+        ttl = self._settings.closed_period_cache_ttl_seconds
+        return await cached(
+            _all_time_pharmacy_totals,
+            (self._db.name, tuple(allowed_partners)),
+            lambda: count(ttl)
+        )
 
     async def get_ecommerce_partner_time_series(
         self,
@@ -540,61 +581,20 @@ class BookingRepository:
         Returns data for stacked charts showing partner contributions.
         Filters by allowed partners from config by default.
         """
-        cancelled_state = self._settings.cancelled_state_id
-        
         # Use provided partners or default to allowed partners from config
         allowed_partners = partners if partners else self._settings.partners
         
-        # Build partner regex conditions
-        partner_conditions = [
-            {"thirdUser.user": {"$regex": f"^{p}$", "$options": "i"}}
-            for p in allowed_partners
-        ]
-        
-        # Define date grouping based on group_by parameter
-        if group_by == "week":
-            # Use $isoWeekYear to correctly handle year boundaries for ISO weeks
-            date_group = {
-                "year": {"$isoWeekYear": "$createdDate"},
-                "week": {"$isoWeek": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1, "_id.week": 1}
-        elif group_by == "quarter":
-            date_group = {
-                "year": {"$year": "$createdDate"},
-                "quarter": {
-                    "$ceil": {"$divide": [{"$month": "$createdDate"}, 3]}
-                }
-            }
-            sort_fields = {"_id.year": 1, "_id.quarter": 1}
-        elif group_by == "year":
-            date_group = {
-                "year": {"$year": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1}
-        else:  # month (default)
-            date_group = {
-                "year": {"$year": "$createdDate"},
-                "month": {"$month": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1, "_id.month": 1}
+        date_group, sort_fields = _TIME_GROUPINGS.get(group_by, _TIME_GROUPINGS["month"])
         
         pipeline = [
             {
                 "$match": {
-                    "thirdUser.user": {"$exists": True},
+                    "thirdUser.user": {"$in": allowed_partners},
                     "origin": {"$exists": False},
-                    "createdDate": {"$gte": start_date, "$lte": end_date},
-                    "$or": partner_conditions
-                }
-            },
-            {
-                "$addFields": {
-                    "gmv": self._gmv_calculation(),
-                    "is_cancelled": {"$eq": ["$state", cancelled_state]},
-                    "partner_lower": {"$toLower": "$thirdUser.user"}
+                    "createdDate": {"$gte": start_date, "$lte": end_date}
                 }
             },
+            self._booking_fields("createdDate", partner_lower={"$toLower": "$thirdUser.user"}),
             {
                 "$group": {
                     "_id": {
@@ -603,37 +603,30 @@ class BookingRepository:
                     },
                     "gross_bookings": {"$sum": 1},
                     "cancelled_bookings": {
-                        "$sum": {"$cond": ["$is_cancelled", 1, 0]}
+                        "$sum": {"$cond": [self._is_cancelled, 1, 0]}
                     },
                     "gross_gmv": {"$sum": "$gmv"},
                     "cancelled_gmv": {
-                        "$sum": {"$cond": ["$is_cancelled", "$gmv", 0]}
+                        "$sum": {"$cond": [self._is_cancelled, "$gmv", 0]}
                     }
                 }
             },
             {"$sort": sort_fields},
+            {"$limit": 500},
             {
                 "$project": {
                     "_id": 0,
-                    "period": {
-                        k: v for k, v in {
-                            "year": "$_id.year",
-                            "month": "$_id.month" if group_by == "month" else None,
-                            "week": "$_id.week" if group_by == "week" else None,
-                            "quarter": "$_id.quarter" if group_by == "quarter" else None
-                        }.items() if v is not None
-                    },
+                    "period": {k: f"$_id.{k}" for k in date_group},
                     "partner": "$_id.partner",
                     "gross_bookings": 1,
                     "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
-                    "gross_gmv": self._round_to_2_decimals("$gross_gmv"),
-                    "net_gmv": self._round_to_2_decimals({"$subtract": ["$gross_gmv", "$cancelled_gmv"]})
+                    "gross_gmv": 1,
+                    "net_gmv": {"$subtract": ["$gross_gmv", "$cancelled_gmv"]}
                 }
             }
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        return await cursor.to_list(length=500)
+        return await self._aggregate(pipeline, 500, end_date, collation=PARTNER_COLLATION)
 
     async def get_shortage_time_series(
         self,
@@ -645,35 +638,7 @@ class BookingRepository:
         Get shortage metrics grouped by time period.
         group_by: 'week', 'month', 'quarter', 'year'
         """
-        cancelled_state = self._settings.cancelled_state_id
-        
-        # Define date grouping based on group_by parameter
-        if group_by == "week":
-            # Use $isoWeekYear to correctly handle year boundaries for ISO weeks
-            date_group = {
-                "year": {"$isoWeekYear": "$createdDate"},
-                "week": {"$isoWeek": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1, "_id.week": 1}
-        elif group_by == "quarter":
-            date_group = {
-                "year": {"$year": "$createdDate"},
-                "quarter": {
-                    "$ceil": {"$divide": [{"$month": "$createdDate"}, 3]}
-                }
-            }
-            sort_fields = {"_id.year": 1, "_id.quarter": 1}
-        elif group_by == "year":
-            date_group = {
-                "year": {"$year": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1}
-        else:  # month (default)
-            date_group = {
-                "year": {"$year": "$createdDate"},
-                "month": {"$month": "$createdDate"}
-            }
-            sort_fields = {"_id.year": 1, "_id.month": 1}
+        date_group, sort_fields = _TIME_GROUPINGS.get(group_by, _TIME_GROUPINGS["month"])
         
         pipeline = [
             # Match shortage bookings (origin exists)
@@ -683,67 +648,45 @@ class BookingRepository:
                     "createdDate": {"$gte": start_date, "$lte": end_date}
                 }
             },
-            {
-                "$addFields": {
-                    "gmv": self._gmv_calculation(),
-                    "is_cancelled": {"$eq": ["$state", cancelled_state]}
-                }
-            },
+            self._booking_fields("origin", "target", "createdDate"),
             {
                 "$group": {
                     "_id": date_group,
                     "gross_bookings": {"$sum": 1},
                     "cancelled_bookings": {
-                        "$sum": {"$cond": ["$is_cancelled", 1, 0]}
+                        "$sum": {"$cond": [self._is_cancelled, 1, 0]}
                     },
                     "gross_gmv": {"$sum": "$gmv"},
                     "cancelled_gmv": {
-                        "$sum": {"$cond": ["$is_cancelled", "$gmv", 0]}
+                        "$sum": {"$cond": [self._is_cancelled, "$gmv", 0]}
                     },
                     "unique_origins": {"$addToSet": "$origin"},
                     "unique_targets": {"$addToSet": "$target"}
                 }
             },
             {"$sort": sort_fields},
+            {"$limit": 500},
             {
                 "$project": {
                     "_id": 0,
-                    "period": {
-                        k: v for k, v in {
-                            "year": "$_id.year",
-                            "month": "$_id.month" if group_by == "month" else None,
-                            "week": "$_id.week" if group_by == "week" else None,
-                            "quarter": "$_id.quarter" if group_by == "quarter" else None
-                        }.items() if v is not None
-                    },
+                    "period": {k: f"$_id.{k}" for k in date_group},
                     "gross_bookings": 1,
                     "cancelled_bookings": 1,
                     "net_bookings": {"$subtract": ["$gross_bookings", "$cancelled_bookings"]},
-                    "gross_gmv": self._round_to_2_decimals("$gross_gmv"),
-                    "cancelled_gmv": self._round_to_2_decimals("$cancelled_gmv"),
-                    "net_gmv": self._round_to_2_decimals({"$subtract": ["$gross_gmv", "$cancelled_gmv"]}),
+                    "gross_gmv": 1,
+                    "cancelled_gmv": 1,
+                    "net_gmv": {"$subtract": ["$gross_gmv", "$cancelled_gmv"]},
                     "sending_pharmacies": {"$size": "$unique_origins"},
                     "receiving_pharmacies": {"$size": "$unique_targets"},
                     # All unique pharmacies (union of origins and targets)
-                    "all_unique_pharmacies": {
-                        "$setUnion": ["$unique_origins", "$unique_targets"]
+                    "active_pharmacies": {
+                        "$size": {"$setUnion": ["$unique_origins", "$unique_targets"]}
                     }
                 }
-            },
-            {
-                "$addFields": {
-                    "active_pharmacies": {"$size": "$all_unique_pharmacies"}
-                }
-            },
-            {
-                "$project": {
-                    "all_unique_pharmacies": 0  # Remove the temp field from output
-                }
             }
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        return await cursor.to_list(length=500)
+        return await self._aggregate(pipeline, 500, end_date)
 
     async def get_total_shortage_pharmacies(
         self,
@@ -753,6 +696,9 @@ class BookingRepository:
         """
         Get total unique pharmacies that have participated in shortage
         (either as origin or target).
+
+        Each booking is split into its two pharmacies and grouped by
+        pharmacy, so no stage holds every pharmacy id in one array.
         """
         match_stage: Dict[str, Any] = {
             "origin": {"$exists": True}
@@ -766,27 +712,15 @@ class BookingRepository:
         
         pipeline = [
             {"$match": match_stage},
-            {
-                "$group": {
-                    "_id": None,
-                    "origins": {"$addToSet": "$origin"},
-                    "targets": {"$addToSet": "$target"}
-                }
-            },
-            {
-                "$project": {
-                    "all_pharmacies": {"$setUnion": ["$origins", "$targets"]}
-                }
-            },
-            {
-                "$project": {
-                    "total": {"$size": "$all_pharmacies"}
-                }
-            }
+            {"$project": {"_id": 0, "pharmacy": ["$origin", "$target"]}},
+            {"$unwind": "$pharmacy"},
+            # A booking without a target doesn't add a pharmacy
+            {"$match": {"pharmacy": {"$ne": None}}},
+            {"$group": {"_id": "$pharmacy"}},
+            {"$count": "total"}
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        results = await cursor.to_list(length=1)
+        results = await self._aggregate(pipeline, 1, end_date)
         
         if results:
             return results[0].get("total", 0)
@@ -1,6 +1,9 @@
-from typing import Dict, Any, List, Optional
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+import hashlib
+import orjson
+from pymongo.asynchronous.database import AsyncDatabase
 
+from app.core.cache import shared_cache_ttl, shared_cached
 from app.core.config import get_settings
 
 
@@ -10,14 +13,113 @@ class PharmacyRepository:
     Handles pharmacy counts and tag-based queries.
     """
     
-    def __init__(self, database: AsyncIOMotorDatabase):
+    def __init__(self, database: AsyncDatabase):
         self._db = database
         self._collection = database["pharmacies"]
         self._settings = get_settings()
     
+    async def _shared(
+        self,
+        name: str,
+        query: Any,
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Run a query, sharing its result across workers through Redis.
+
+        The key hashes the database name, the method name and the query
+        (filter, pipeline or tags), so changing the partner tags in config
+        uses new entries. Pharmacy data has no period, so results live for
+        METRICS_CACHE_TTL_SECONDS.
+        """
+        digest = hashlib.blake2b(
+            orjson.dumps([self._db.name, name, query]),
+            digest_size=16
+        ).hexdigest()
+        return await shared_cached(
+            f"agg:pharmacies:{digest}", shared_cache_ttl(None), compute
+        )
+    
+    def _tagged_partners(self) -> Dict[str, Any]:
+        """Partners with at least one pharmacy tag, and their tags."""
+        return {
+            partner: tags
+            for partner, tags in self._settings.partner_tags.items()
+            if tags
+        }
+    
+    def _partner_tag_counts(self, partner_tags: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        $group counting, for every partner at once, the pharmacies that have
+        at least one of its tags (a pharmacy can count for several partners).
+        """
+        # tags may be missing or a single string; normalize to an array
+        tags_array = {"$cond": [{"$isArray": "$tags"}, "$tags", ["$tags"]]}
+        return {
+            "$group": {
+                "_id": None,
+                **{
+                    partner: {
+                        "$sum": {
+                            "$cond": [
+                                {"$gt": [
+                                    {"$size": {"$setIntersection": [tags_array, tags]}},
+                                    0
+                                ]},
+                                1,
+                                0
+                            ]
+                        }
+                    }
+                    for partner, tags in partner_tags.items()
+                }
+            }
+        }
+    
+    def _partner_distribution(
+        self,
+        partner_tags: Dict[str, Any],
+        counts: Dict[str, int]
+    ) -> List[Dict[str, Any]]:
+        """Per-partner pharmacy counts with their tags, largest first."""
+        results = [
+            {
+                "partner": partner,
+                "pharmacies": counts.get(partner, 0),
+                "tags": tags
+            }
+            for partner, tags in partner_tags.items()
+        ]
+        results.sort(key=lambda x: x["pharmacies"], reverse=True)
+        return results
+    
+    async def _count_by_partner(self, match: Dict[str, Any], name: str) -> Dict[str, int]:
+        """
+        Pharmacies matching match, counted per tagged partner in one
+        aggregation instead of one count_documents per partner.
+        """
+        partner_tags = self._tagged_partners()
+        all_tags = sorted({tag for tags in partner_tags.values() for tag in tags})
+        pipeline = [
+            # Only pharmacies with some partner tag reach the $group
+            {"$match": {**match, "tags": {"$in": all_tags}}},
+            self._partner_tag_counts(partner_tags)
+        ]
+        
+        async def run() -> List[Dict[str, Any]]:
+            cursor = await self._collection.aggregate(pipeline)
+            return await cursor.to_list(length=1)
+        
+        results = await self._shared(name, pipeline, run)
+        counts = results[0] if results else {}
+        return {partner: counts.get(partner, 0) for partner in partner_tags}
+    
     async def count_active_pharmacies(self) -> int:
         """Count pharmacies with active=1."""
-        return await self._collection.count_documents({"active": 1})
+        query = {"active": 1}
+        return await self._shared(
+            "count_active", query, lambda: self._collection.count_documents(query)
+        )
     
     async def count_pharmacies_with_partner_tag(self, partner: str) -> int:
         """
@@ -27,31 +129,23 @@ class PharmacyRepository:
         if partner.lower() in self._settings.partners_without_tags:
             return 0
         
-        tags = self._settings.partner_tags.get(partner.lower(), [])
+        tags = self._settings.partner_tags.get(partner.lower(), ())
         
         if not tags:
             return 0
         
         # Count pharmacies that have at least one of the partner's tags
-        return await self._collection.count_documents({
-            "tags": {"$in": tags}
-        })
+        query = {"tags": {"$in": tags}}
+        return await self._shared(
+            "count_partner_tag", query, lambda: self._collection.count_documents(query)
+        )
     
     async def get_all_partner_pharmacy_counts(self) -> Dict[str, int]:
         """
         Get pharmacy counts for all partners with tags.
         Returns dict: {partner: count}
         """
-        counts = {}
-        
-        for partner, tags in self._settings.partner_tags.items():
-            if tags:
-                count = await self._collection.count_documents({
-                    "tags": {"$in": tags}
-                })
-                counts[partner] = count
-        
-        return counts
+        return await self._count_by_partner({}, "partner_counts")
     
     async def get_pharmacy_distribution_by_province(self) -> List[Dict[str, Any]]:
         """Get pharmacy count distribution by province."""
@@ -67,8 +161,11 @@ class PharmacyRepository:
             {"$limit": 20}
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        results = await cursor.to_list(length=20)
+        async def run() -> List[Dict[str, Any]]:
+            cursor = await self._collection.aggregate(pipeline)
+            return await cursor.to_list(length=20)
+        
+        results = await self._shared("by_province", pipeline, run)
         
         return [
             {"province": r["_id"] or "Sin provincia", "count": r["count"]}
@@ -89,8 +186,11 @@ class PharmacyRepository:
             {"$limit": 20}
         ]
         
-        cursor = self._collection.aggregate(pipeline)
-        results = await cursor.to_list(length=20)
+        async def run() -> List[Dict[str, Any]]:
+            cursor = await self._collection.aggregate(pipeline)
+            return await cursor.to_list(length=20)
+        
+        results = await self._shared("by_city", pipeline, run)
         
         return [
             {"city": r["_id"] or "Sin ciudad", "count": r["count"]}
@@ -102,23 +202,60 @@ class PharmacyRepository:
         Get distribution of pharmacies by partner tags.
         Shows how many pharmacies are active in each partner.
         """
-        results = []
-        
-        for partner, tags in self._settings.partner_tags.items():
-            if tags:
-                count = await self._collection.count_documents({
-                    "tags": {"$in": tags},
-                    "active": 1
-                })
-                results.append({
-                    "partner": partner,
-                    "pharmacies": count,
-                    "tags": tags
-                })
-        
-        # Sort by pharmacy count descending
-        results.sort(key=lambda x: x["pharmacies"], reverse=True)
+        counts = await self._count_by_partner({"active": 1}, "partner_distribution")
+        return self._partner_distribution(self._tagged_partners(), counts)
+    
+    async def get_summary(self) -> Dict[str, Any]:
+        """
+        Get active count, province/city and partner distributions in one query.
         
-        return results
+        Single $facet aggregation over active pharmacies, equivalent to calling
+        count_active_pharmacies, get_pharmacy_distribution_by_province,
+        get_pharmacy_distribution_by_city and get_partner_tag_distribution.
+        """
+        partner_tags = self._tagged_partners()
+        
+        def top(field: str) -> List[Dict[str, Any]]:
+            return [
+                {"$group": {"_id": f"$contact.{field}", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+                {"$limit": 20}
+            ]
+        
+        pipeline = [
+            {"$match": {"active": 1}},
+            {
+                "$facet": {
+                    "active": [{"$count": "count"}],
+                    "byProvince": top("province"),
+                    "byCity": top("city"),
+                    "byPartner": [self._partner_tag_counts(partner_tags)]
+                }
+            }
+        ]
+        
+        async def run() -> List[Dict[str, Any]]:
+            cursor = await self._collection.aggregate(pipeline)
+            return await cursor.to_list(length=1)
+        
+        results = await self._shared("summary", pipeline, run)
+        facets = results[0] if results else {}
+        
+        active = facets.get("active") or [{"count": 0}]
+        partner_counts = (facets.get("byPartner") or [{}])[0]
+        by_partner = self._partner_distribution(partner_tags, partner_counts)
+        
+        return {
+            "active_pharmacies": active[0]["count"],
+            "by_province": [
+                {"province": r["_id"] or "Sin provincia", "count": r["count"]}
+                for r in facets.get("byProvince", [])
+            ],
+            "by_city": [
+                {"city": r["_id"] or "Sin ciudad", "count": r["count"]}
+                for r in facets.get("byCity", [])
+            ],
+            "by_partner": by_partner
+        }
 
 
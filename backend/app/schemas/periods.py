@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, timezone, date
 from typing import Tuple
 
 from app.schemas.metrics import PeriodType, PeriodFilter
@@ -11,7 +11,8 @@ def get_period_dates(period: PeriodFilter) -> Tuple[datetime, datetime]:
     Returns:
         Tuple of (start_datetime, end_datetime)
     """
-    now = datetime.utcnow()
+    # Naive UTC, matching how createdDate is stored and queried
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
     today = now.replace(hour=0, minute=0, second=0, microsecond=0)
     current_year = now.year
     
@@ -85,3 +86,15 @@ def get_period_dates(period: PeriodFilter) -> Tuple[datetime, datetime]:
     return start, end
 
 
+
+
+def period_cache_key(period: PeriodFilter, start: datetime) -> Tuple:
+    """
+    Stable cache key for a period.
+    
+    Open-ended periods (today, this week/month/year) end at "now", so the
+    resolved end date can't be part of a key. The period type plus its
+    resolved start identify the window until it rolls over; custom ranges
+    add their explicit dates.
+    """
+    return (period.period_type, start, period.start_date, period.end_date)
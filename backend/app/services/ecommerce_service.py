@@ -1,5 +1,7 @@
+import asyncio
+from datetime import datetime
 from typing import List, Dict, Any, Optional
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.repositories.booking_repository import BookingRepository
 from app.repositories.pharmacy_repository import PharmacyRepository
@@ -10,8 +12,9 @@ from app.schemas.metrics import (
     BaseMetrics,
     TimeSeriesPoint,
 )
-from app.schemas.periods import get_period_dates
+from app.schemas.periods import get_period_dates, period_cache_key
 from app.core.config import get_settings
+from app.core.cache import cached, results_cache
 
 
 class EcommerceService:
@@ -20,7 +23,10 @@ class EcommerceService:
     Handles all partner-based booking metrics.
     """
     
-    def __init__(self, database: AsyncIOMotorDatabase):
+    # Results shared across requests, keyed by resolved period and filters
+    _results_cache = results_cache()
+    
+    def __init__(self, database: AsyncDatabase):
         self._booking_repo = BookingRepository(database)
         self._pharmacy_repo = PharmacyRepository(database)
         self._settings = get_settings()
@@ -99,14 +105,26 @@ class EcommerceService:
         """Get ecommerce metrics for all partners in the given period."""
         
         start_date, end_date = get_period_dates(period)
-        
-        # Get raw metrics from repository
-        raw_metrics = await self._booking_repo.get_all_ecommerce_metrics(
-            start_date, end_date
+        key = ("metrics", period_cache_key(period, start_date))
+        return await cached(
+            self._results_cache, key,
+            lambda: self._compute_metrics(period, start_date, end_date)
         )
-        
-        # Get pharmacy counts for all partners
-        pharmacy_counts = await self._pharmacy_repo.get_all_partner_pharmacy_counts()
+    
+    async def _compute_metrics(
+        self,
+        period: PeriodFilter,
+        start_date: datetime,
+        end_date: datetime
+    ) -> EcommerceResponse:
+        # Independent queries, run concurrently: per-partner metrics and
+        # totals (one $facet pipeline) and pharmacy counts
+        summary, pharmacy_counts = await asyncio.gather(
+            self._booking_repo.get_ecommerce_summary(start_date, end_date),
+            self._pharmacy_repo.get_all_partner_pharmacy_counts()
+        )
+        raw_metrics = summary["partners"]
+        totals_raw = summary["totals"]
         
         # Calculate metrics for each partner
         partners_metrics: List[EcommerceMetrics] = []
@@ -119,16 +137,14 @@ class EcommerceService:
             metrics.partner = partner
             partners_metrics.append(metrics)
         
-        # Get totals
-        totals_raw = await self._booking_repo.get_ecommerce_totals(
-            start_date, end_date
-        )
-        
+        # The totals already count the distinct pharmacies with orders in
+        # the period, so no separate count query is needed
         totals = await self._calculate_totals(
             totals_raw,
             partners=None,  # No filter for global totals
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            total_pharmacies=totals_raw.get("pharmacies_with_orders", 0)
         )
         
         return EcommerceResponse(
@@ -147,15 +163,24 @@ class EcommerceService:
         """Get ecommerce metrics for a specific partner."""
         
         start_date, end_date = get_period_dates(period)
-        
-        # Get raw metrics
-        raw_metrics = await self._booking_repo.get_ecommerce_metrics_by_partner(
-            partner, start_date, end_date
+        key = ("partner", partner.lower(), period_cache_key(period, start_date))
+        return await cached(
+            self._results_cache, key,
+            lambda: self._compute_partner_metrics(partner, start_date, end_date)
         )
-        
-        # Get pharmacy count for this partner
-        pharmacies_with_tag = await self._pharmacy_repo.count_pharmacies_with_partner_tag(
-            partner
+    
+    async def _compute_partner_metrics(
+        self,
+        partner: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> EcommerceMetrics:
+        # Raw metrics and this partner's pharmacy count, fetched concurrently
+        raw_metrics, pharmacies_with_tag = await asyncio.gather(
+            self._booking_repo.get_ecommerce_metrics_by_partner(
+                partner, start_date, end_date
+            ),
+            self._pharmacy_repo.count_pharmacies_with_partner_tag(partner)
         )
         
         raw_metrics["partner"] = partner.lower()
@@ -167,9 +192,13 @@ class EcommerceService:
         raw: Dict[str, Any],
         partners: Optional[List[str]] = None,
         start_date: Optional[Any] = None,
-        end_date: Optional[Any] = None
+        end_date: Optional[Any] = None,
+        total_pharmacies: Optional[int] = None
     ) -> BaseMetrics:
-        """Calculate total metrics across all partners or filtered by partners."""
+        """
+        Calculate total metrics across all partners or filtered by partners.
+        total_pharmacies is queried unless the caller already has it.
+        """
         
         gross_bookings = raw.get("gross_bookings", 0)
         cancelled_bookings = raw.get("cancelled_bookings", 0)
@@ -180,11 +209,12 @@ class EcommerceService:
         pharmacies_with_orders = raw.get("pharmacies_with_orders", 0)
         
         # Get total pharmacies (filtered by partners if provided)
-        total_pharmacies = await self._booking_repo.get_total_pharmacies(
-            partners=partners,
-            start_date=start_date,
-            end_date=end_date
-        )
+        if total_pharmacies is None:
+            total_pharmacies = await self._booking_repo.get_total_pharmacies(
+                partners=partners,
+                start_date=start_date,
+                end_date=end_date
+            )
         
         pct_cancelled_bookings = (
             (cancelled_bookings / gross_bookings * 100) 
@@ -236,16 +266,33 @@ class EcommerceService:
         """Get time series metrics grouped by period."""
         
         start_date, end_date = get_period_dates(period)
-        
-        # Get total pharmacies (filtered by partners if provided)
-        total_pharmacies = await self._booking_repo.get_total_pharmacies(
-            partners=partners,
-            start_date=None,  # Don't filter by date for total pharmacies base
-            end_date=None
+        key = (
+            "timeseries", period_cache_key(period, start_date), group_by,
+            tuple(partners) if partners else None
         )
-        
-        raw_data = await self._booking_repo.get_ecommerce_time_series(
-            start_date, end_date, group_by, partners
+        return await cached(
+            self._results_cache, key,
+            lambda: self._compute_time_series(start_date, end_date, group_by, partners)
+        )
+    
+    async def _compute_time_series(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        group_by: str,
+        partners: Optional[List[str]]
+    ) -> Dict[str, Any]:
+        # Total pharmacies (filtered by partners if provided) and the series,
+        # fetched concurrently
+        total_pharmacies, raw_data = await asyncio.gather(
+            self._booking_repo.get_total_pharmacies(
+                partners=partners,
+                start_date=None,  # Don't filter by date for total pharmacies base
+                end_date=None
+            ),
+            self._booking_repo.get_ecommerce_time_series(
+                start_date, end_date, group_by, partners
+            )
         )
         
         result = []
@@ -297,7 +344,18 @@ class EcommerceService:
         """Get time series metrics grouped by period and partner for stacked charts."""
         
         start_date, end_date = get_period_dates(period)
-        
+        key = ("partner_timeseries", period_cache_key(period, start_date), group_by)
+        return await cached(
+            self._results_cache, key,
+            lambda: self._compute_partner_time_series(start_date, end_date, group_by)
+        )
+    
+    async def _compute_partner_time_series(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        group_by: str
+    ) -> Dict[str, Any]:
         raw_data = await self._booking_repo.get_ecommerce_partner_time_series(
             start_date, end_date, group_by
         )
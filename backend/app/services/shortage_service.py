@@ -1,5 +1,7 @@
+import asyncio
+from datetime import datetime
 from typing import Dict, Any, List
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.repositories.booking_repository import BookingRepository
 from app.repositories.pharmacy_repository import PharmacyRepository
@@ -9,7 +11,8 @@ from app.schemas.metrics import (
     ShortageResponse,
     ShortageTimeSeriesPoint,
 )
-from app.schemas.periods import get_period_dates
+from app.schemas.periods import get_period_dates, period_cache_key
+from app.core.cache import cached, results_cache
 
 
 class ShortageService:
@@ -18,7 +21,10 @@ class ShortageService:
     Handles all internal transfer (shortage) metrics - global, no partner filter.
     """
     
-    def __init__(self, database: AsyncIOMotorDatabase):
+    # Results shared across requests, keyed by resolved period and filters
+    _results_cache = results_cache()
+    
+    def __init__(self, database: AsyncDatabase):
         self._booking_repo = BookingRepository(database)
         self._pharmacy_repo = PharmacyRepository(database)
     
@@ -86,14 +92,23 @@ class ShortageService:
         """Get shortage metrics for the given period."""
         
         start_date, end_date = get_period_dates(period)
-        
-        # Get raw shortage metrics
-        raw_metrics = await self._booking_repo.get_shortage_metrics(
-            start_date, end_date
+        key = ("metrics", period_cache_key(period, start_date))
+        return await cached(
+            self._results_cache, key,
+            lambda: self._compute_metrics(period, start_date, end_date)
+        )
+    
+    async def _compute_metrics(
+        self,
+        period: PeriodFilter,
+        start_date: datetime,
+        end_date: datetime
+    ) -> ShortageResponse:
+        # Raw shortage metrics and active pharmacies count, fetched concurrently
+        raw_metrics, active_pharmacies = await asyncio.gather(
+            self._booking_repo.get_shortage_metrics(start_date, end_date),
+            self._pharmacy_repo.count_active_pharmacies()
         )
-        
-        # Get active pharmacies count
-        active_pharmacies = await self._pharmacy_repo.count_active_pharmacies()
         
         # Calculate derived metrics
         metrics = self._calculate_derived_metrics(raw_metrics, active_pharmacies)
@@ -113,14 +128,23 @@ class ShortageService:
         """Get shortage time series metrics grouped by period."""
         
         start_date, end_date = get_period_dates(period)
-        
-        raw_data = await self._booking_repo.get_shortage_time_series(
-            start_date, end_date, group_by
+        key = ("timeseries", period_cache_key(period, start_date), group_by)
+        return await cached(
+            self._results_cache, key,
+            lambda: self._compute_time_series(start_date, end_date, group_by)
         )
-        
-        # Get total pharmacies that have ever participated in shortage
-        total_pharmacies = await self._booking_repo.get_total_shortage_pharmacies(
-            start_date, end_date
+    
+    async def _compute_time_series(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        group_by: str
+    ) -> Dict[str, Any]:
+        # The series and the total pharmacies that participated in shortage
+        # in the period, fetched concurrently
+        raw_data, total_pharmacies = await asyncio.gather(
+            self._booking_repo.get_shortage_time_series(start_date, end_date, group_by),
+            self._booking_repo.get_total_shortage_pharmacies(start_date, end_date)
         )
         
         result = []
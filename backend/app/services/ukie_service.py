@@ -4,13 +4,15 @@ UkieService - Ecommerce service for Ireland (Ukie) database.
 Inherits from EcommerceService but uses Ireland-specific partner configuration.
 """
 
-from typing import List, Optional
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from functools import cached_property
+from typing import FrozenSet, List, Optional
+from pymongo.asynchronous.database import AsyncDatabase
 
 from app.services.ecommerce_service import EcommerceService
 from app.repositories.booking_repository import BookingRepository
 from app.repositories.pharmacy_repository import PharmacyRepository
 from app.core.config import get_settings
+from app.core.cache import results_cache
 
 
 class UkieBookingRepository(BookingRepository):
@@ -19,7 +21,7 @@ class UkieBookingRepository(BookingRepository):
     Overrides the partners list to use partners_ireland from settings.
     """
 
-    def __init__(self, database: AsyncIOMotorDatabase):
+    def __init__(self, database: AsyncDatabase):
         super().__init__(database)
         # Override partners list with Ireland-specific partners
         self._settings = IrelandSettingsWrapper(self._settings)
@@ -39,10 +41,10 @@ class IrelandSettingsWrapper:
         """Return Ireland-specific partners instead of Spain partners."""
         return self._original.partners_ireland
 
-    @property
-    def partners_without_tags(self) -> List[str]:
+    @cached_property
+    def partners_without_tags(self) -> FrozenSet[str]:
         """All Ireland partners are without tags (no pharmacy tag system in Ireland)."""
-        return self._original.partners_ireland
+        return frozenset(self._original.partners_ireland)
 
     @property
     def cancelled_state_id(self) -> str:
@@ -65,7 +67,10 @@ class UkieService(EcommerceService):
     Uses Ireland-specific partner configuration.
     """
 
-    def __init__(self, database: AsyncIOMotorDatabase):
+    # Separate from EcommerceService's cache: same keys, different database
+    _results_cache = results_cache()
+
+    def __init__(self, database: AsyncDatabase):
         # Don't call super().__init__() - we need to use our custom repository
         self._booking_repo = UkieBookingRepository(database)
         self._pharmacy_repo = PharmacyRepository(database)
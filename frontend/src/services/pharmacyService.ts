@@ -1,7 +1,17 @@
 import api from './api';
-import type { PharmacyDistribution, PartnerPharmacyDistribution } from '../types';
+import type {
+  PharmacyDistribution,
+  PartnerPharmacyDistribution,
+  PharmacySummary,
+} from '../types';
 
 export const pharmacyService = {
+  // Active count and all distributions in a single request
+  async getSummary(): Promise<PharmacySummary> {
+    const response = await api.get<PharmacySummary>('/pharmacies/summary');
+    return response.data;
+  },
+
   async getActiveCount(): Promise<{ active_pharmacies: number }> {
     const response = await api.get<{ active_pharmacies: number }>(
       '/pharmacies/count/active'
@@ -157,6 +157,13 @@ export interface PartnerPharmacyDistribution {
   tags: string[];
 }
 
+export interface PharmacySummary {
+  active_pharmacies: number;
+  by_province: PharmacyDistribution[];
+  by_city: PharmacyDistribution[];
+  by_partner: PartnerPharmacyDistribution[];
+}
+
 // Period options for UI
 export const PERIOD_OPTIONS: { value: PeriodType; label: string; group: string }[] = [
   { value: 'today', label: 'Hoy', group: 'Día' },